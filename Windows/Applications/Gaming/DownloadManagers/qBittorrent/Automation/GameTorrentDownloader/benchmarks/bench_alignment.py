@@ -0,0 +1,85 @@
+# benchmarks/bench_alignment.py
+# Worst-case token alignment on long titles. Each shape is built to make the
+# old position scans walk the whole title for every query token. The shapes
+# are: the query repeated backwards, a title of distinct noise words with the
+# query at the very end, and a query word that is one letter off on every
+# token. The old scans run as reference() and their counts are checked
+# against Alignment. Usage: python benchmarks/bench_alignment.py [lengths...]
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import yaml
+from matching.normalizer import QueryNormalizer
+from matching.scorer import ConfidenceScorer
+from matching.alignment import Alignment
+
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+QUERY = "the witcher 3 wild hunt witcher"
+ROUNDS = 20
+
+def reference(query, tokens):
+    used = []
+    matched = 0
+    for q in query:
+        for i, t in enumerate(tokens):
+            if i not in used and q == t:
+                used.append(i)
+                matched += 1
+                break
+    last = -1
+    for q in query:
+        for i, t in enumerate(tokens):
+            if i > last and q == t:
+                last = i
+                break
+        else:
+            return matched, False
+    return matched, True
+
+def make_title(shape, n):
+    words = QUERY.split()
+    if shape == "reversed":
+        tokens = (words[::-1] * n)[:n]
+    elif shape == "query last":
+        tokens = [f"noise{i:04d}x" for i in range(n - len(words))] + words
+    else:
+        tokens = [f"witchet{chr(97 + i % 26)}{i}" for i in range(n)]
+    # A repack group keeps the detector from rejecting the noise as non-game.
+    return " ".join(["fitgirl", "repack"] + tokens[2:])
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn()
+    return result, (time.perf_counter() - start) / ROUNDS * 1000
+
+def main():
+    lengths = [int(a) for a in sys.argv[1:]] or [10, 100, 1000]
+    with open(CONFIG, 'r', encoding='utf-8') as f:
+        aliases = yaml.safe_load(f).get('aliases', {})
+    scorer = ConfidenceScorer(QueryNormalizer(aliases))
+    matcher = scorer.compile(QUERY)
+    query = matcher.query_tokens_rom
+    _, query_ids, counts, _, wanted = matcher.encoded(scorer.titles.vocab)
+    print(f"{'shape':>12}{'tokens':>8}{'reference ms':>14}{'alignment ms':>14}{'score() ms':>12}{'score_many() ms':>17}")
+    for shape in ["reversed", "query last", "near miss"]:
+        for n in lengths:
+            title = make_title(shape, n)
+            parsed = scorer.titles.get(title)
+            tokens = parsed.roman_tokens
+            expected, reference_time = timed(lambda: reference(query, tokens))
+
+            def align():
+                alignment = Alignment(parsed.roman_ids, wanted)
+                return alignment.matched(counts), alignment.ordered(query_ids)
+            found, align_time = timed(align)
+            assert found == expected, f"{shape}/{n}: alignment {found} != reference {expected}"
+            score, score_time = timed(lambda: matcher.score(title))
+            scores, many_time = timed(lambda: matcher.score_many([title]))
+            assert scores.tolist() == [score], "score_many differs from score()"
+            print(f"{shape:>12}{n:>8}{reference_time:>14.3f}{align_time:>14.3f}{score_time:>12.3f}{many_time:>17.3f}")
+    print(f"Title cache: {scorer.titles.summary()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_extract.py
+# Compares the old BeautifulSoup(html.parser) extraction with the lxml path
+# on the saved pages in tests/fixtures. Usage: python benchmarks/bench_extract.py [iterations]
+# Peak memory comes from tracemalloc, which does not see libxml2's own
+# allocations, so the lxml column only covers the Python-side objects.
+import sys
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from bs4 import BeautifulSoup
+from providers.base import SearchResult
+from providers.leetx import LeetxProvider
+from providers.nyaa import NyaaProvider
+from providers.torrentgalaxy import TorrentGalaxyProvider
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures"
+
+def legacy_leetx_rows(p, text):
+    soup = BeautifulSoup(text, 'html.parser')
+    table = soup.find('table', class_='table-list')
+    if not table:
+        return []
+    entries = []
+    for row in table.find('tbody').find_all('tr'):
+        cols = row.find_all('td')
+        if len(cols) < 7:
+            continue
+        name_tag = cols[0].find('a', class_='name')
+        if not name_tag:
+            continue
+        entries.append((name_tag.get_text(strip=True), name_tag.get('href', ''),
+                        p._parse_int(cols[1].get_text(strip=True)), p._parse_int(cols[2].get_text(strip=True)),
+                        p._parse_size(cols[4].get_text(strip=True))))
+    return entries
+
+def legacy_leetx_magnet(p, text):
+    soup = BeautifulSoup(text, 'html.parser')
+    magnet_link = soup.find('a', href=lambda x: x and x.startswith('magnet:'))
+    return magnet_link['href'] if magnet_link else ""
+
+def legacy_nyaa(p, text):
+    soup = BeautifulSoup(text, 'html.parser')
+    table = soup.find('table', class_='table-hover')
+    if not table:
+        return []
+    results = []
+    for row in table.find('tbody').find_all('tr'):
+        cols = row.find_all('td')
+        if len(cols) < 7:
+            continue
+        title_tag = cols[1].find('a', title=True) or cols[1].find('a')
+        title = title_tag.get('title', title_tag.get_text(strip=True)) if title_tag else ""
+        magnet_tag = cols[2].find('a', href=lambda x: x and x.startswith('magnet:'))
+        magnet = magnet_tag['href'] if magnet_tag else ""
+        if not magnet:
+            continue
+        m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
+        results.append(SearchResult(title, magnet, p._parse_int(cols[4].get_text(strip=True)),
+                                    p._parse_int(cols[5].get_text(strip=True)),
+                                    p._parse_size(cols[3].get_text(strip=True)), "nyaa",
+                                    m.group(1).lower() if m else ""))
+    return results
+
+def legacy_torrentgalaxy(p, text):
+    soup = BeautifulSoup(text, 'html.parser')
+    results = []
+    for row in soup.select('div.tgxtablerow.txlight')[:30]:
+        cols = row.select('div.tgxtablecell')
+        if len(cols) < 8:
+            continue
+        title_tag = cols[1].find('a', title=True)
+        if not title_tag:
+            continue
+        magnet_tag = row.find('a', href=lambda x: x and x.startswith('magnet:'))
+        magnet = magnet_tag['href'] if magnet_tag else ""
+        if not magnet:
+            continue
+        m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
+        results.append(SearchResult(title_tag.get('title', title_tag.get_text(strip=True)), magnet,
+                                    p._parse_int(cols[5].get_text(strip=True)),
+                                    p._parse_int(cols[6].get_text(strip=True)),
+                                    p._parse_size(cols[7].get_text(strip=True)), "torrentgalaxy",
+                                    m.group(1).lower() if m else ""))
+    return results
+
+def measure(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        out = fn()
+    elapsed = (time.perf_counter() - start) / iterations
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    config = {"search": {"cache_dir": tempfile.mkdtemp()}}
+    leetx, nyaa, tgx = LeetxProvider(config), NyaaProvider(config), TorrentGalaxyProvider(config)
+    cases = [
+        ("1337x search", "leetx_search.html",
+         lambda raw: legacy_leetx_rows(leetx, raw.decode()), lambda raw: leetx._parse_rows(raw)),
+        ("1337x detail", "leetx_detail.html",
+         lambda raw: legacy_leetx_magnet(leetx, raw.decode()), lambda raw: leetx._parse_magnet(raw)),
+        ("nyaa search", "nyaa_search.html",
+         lambda raw: legacy_nyaa(nyaa, raw.decode()), lambda raw: nyaa._parse_results(raw)),
+        ("torrentgalaxy search", "torrentgalaxy_search.html",
+         lambda raw: legacy_torrentgalaxy(tgx, raw.decode()), lambda raw: tgx._parse_results(raw)),
+    ]
+    print(f"{'page':<22}{'bs4 ms':>10}{'lxml ms':>10}{'speedup':>9}{'bs4 peak KiB':>14}{'lxml peak KiB':>15}")
+    for label, fixture, before, after in cases:
+        raw = (FIXTURES / fixture).read_bytes()
+        old, old_time, old_peak = measure(lambda: before(raw), iterations)
+        new, new_time, new_peak = measure(lambda: after(raw), iterations)
+        assert old == new, f"{label}: extraction output differs"
+        print(f"{label:<22}{old_time*1000:>10.2f}{new_time*1000:>10.2f}{old_time/new_time:>8.1f}x"
+              f"{old_peak/1024:>14.0f}{new_peak/1024:>15.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_scoring.py
+# Scores synthetic result dumps one title at a time with score() and in one
+# call with score_many(). Usage: python benchmarks/bench_scoring.py [sizes...]
+# The per-title loop is only timed on the first 100k titles; larger sizes are
+# extrapolated from that rate (marked "est."). The "varied" dumps add random
+# words to every title, so the fuzzy tier sees a vocabulary that grows with
+# the dump instead of the few hundred tokens the fixed lists produce.
+import sys
+import os
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import yaml
+from matching.normalizer import QueryNormalizer
+from matching.scorer import ConfidenceScorer
+
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+GAMES = ["Elden Ring", "Grand Theft Auto V", "GTA 5", "Dark Souls III", "Cyberpunk 2077", "The Witcher 3 Wild Hunt",
+         "Baldurs Gate 3", "Red Dead Redemption 2", "God of War Ragnarok", "Resident Evil 4", "Final Fantasy XVI"]
+EXTRAS = ["v1.12.3", "Deluxe Edition", "GOTY", "Complete Edition", "MULTi12", "Update 5", "+ 3 DLCs", "Steam Rip",
+          "1080p WEB-DL x264", "S01E03", "OST FLAC", "Soundtrack", "Trainer", "2019", "(2022)", "[PC]"]
+GROUPS = ["FitGirl Repack", "DODI Repack", "RUNE", "TENOKE", "ElAmigos", "CODEX", "EMPRESS", "KaOs", "", ""]
+SIZES = ["45.2 GB", "850 MB", "1.2 TB", "112 GB", "0.7 GB", "300 MB", ""]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+SAMPLE = 100_000
+
+def make_titles(n, rnd):
+    titles = []
+    for _ in range(n):
+        parts = [rnd.choice(GAMES)] + rnd.sample(EXTRAS, rnd.randint(0, 3)) + [rnd.choice(GROUPS), rnd.choice(SIZES)]
+        titles.append(rnd.choice([" ", ".", "-"]).join(p for p in parts if p))
+    return titles
+
+def make_varied_titles(n, rnd):
+    titles = make_titles(n, rnd)
+    for i, title in enumerate(titles):
+        words = ["".join(rnd.choice(LETTERS) for _ in range(rnd.randint(4, 11))) for _ in range(rnd.randint(1, 4))]
+        titles[i] = " ".join([title] + words)
+    return titles
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    with open(CONFIG, 'r', encoding='utf-8') as f:
+        aliases = yaml.safe_load(f).get('aliases', {})
+    scorer = ConfidenceScorer(QueryNormalizer(aliases))
+    rnd = random.Random(42)
+    print(f"{'dump':>8}{'titles':>10}{'score() s':>14}{'score_many() s':>16}{'speedup':>10}")
+    # The varied dumps use a query with long words; "gta v" is too short for
+    # the fuzzy tier to look at.
+    for kind, make, query in (("fixed", make_titles, "gta v"), ("varied", make_varied_titles, "red dead redemption")):
+        matcher = scorer.compile(query)
+        for n in sizes:
+            titles = make(n, rnd)
+            sample = titles[:SAMPLE]
+            start = time.perf_counter()
+            expected = [matcher.score(t) for t in sample]
+            loop_time = (time.perf_counter() - start) * n / len(sample)
+            start = time.perf_counter()
+            scores = matcher.score_many(titles)
+            batch_time = time.perf_counter() - start
+            assert scores[:len(sample)].tolist() == expected, "score_many differs from score()"
+            label = f"{loop_time:.2f}" + (" est." if n > len(sample) else "")
+            print(f"{kind:>8}{n:>10}{label:>14}{batch_time:>16.2f}{loop_time / batch_time:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
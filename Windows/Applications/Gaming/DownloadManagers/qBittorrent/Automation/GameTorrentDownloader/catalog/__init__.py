@@ -0,0 +1 @@
+from .index import GameCatalog, build_index, load_entries, catalog_key
@@ -0,0 +1,248 @@
+# catalog/index.py
+import bisect
+import csv
+import hashlib
+import json
+import mmap
+import struct
+import sys
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from matching.normalizer import normalize, ROMAN_TO阿拉伯数字
+from providers.magnet_cache import cache_dir
+
+MAGIC = b"GTCAT002"
+HEADER = struct.Struct("<8s5Q32s")
+
+Entry = Tuple[str, List[str]]
+
+
+def catalog_key(text: str) -> str:
+    # Accents are folded here so "pokemon" finds "Pokémon".
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return ' '.join(ROMAN_TO阿拉伯数字.get(t, t) for t in normalize(text).split())
+
+
+def source_stamp(source) -> bytes:
+    # Identifies the file an index was built from: pointing catalog.source
+    # at another file rebuilds the index even when that file is older.
+    path = Path(source).resolve()
+    stat = path.stat()
+    return hashlib.sha256(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}".encode('utf-8')).digest()
+
+
+def load_entries(source) -> List[Entry]:
+    # CSV with a "title" column (else the first column) and an optional
+    # "aliases" column separated by "|", or JSON: a list of titles or of
+    # {"title": ..., "aliases": [...]} objects.
+    path = Path(source)
+    entries = []
+    if path.suffix.lower() == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                if isinstance(item, str):
+                    entries.append((item, []))
+                else:
+                    entries.append((item.get('title') or item.get('name', ''), list(item.get('aliases', []))))
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        header = [h.strip().lower() for h in rows[0]] if rows else []
+        if 'title' in header:
+            title_col = header.index('title')
+            alias_col = header.index('aliases') if 'aliases' in header else None
+            rows = rows[1:]
+        else:
+            title_col, alias_col = 0, None
+        for row in rows:
+            if len(row) <= title_col:
+                continue
+            aliases = row[alias_col].split('|') if alias_col is not None and len(row) > alias_col else []
+            entries.append((row[title_col], [a for a in aliases if a.strip()]))
+    return [(title.strip(), aliases) for title, aliases in entries if title.strip()]
+
+
+def _strings(values: List[bytes]) -> bytes:
+    offsets = array('I', [0])
+    for v in values:
+        offsets.append(offsets[-1] + len(v))
+    blob = b''.join(values)
+    return struct.pack('<I', len(values)) + offsets.tobytes() + blob + b'\0' * (-len(blob) % 4)
+
+
+def build_index(entries: Iterable[Entry], path, stamp: bytes = b''):
+    # Layout: header (ending with the source stamp), then four sections,
+    # each 4-byte aligned:
+    #   titles    display names, by title id
+    #   keys      normalized names and aliases, sorted (prefix search)
+    #   key ids   title id of each key
+    #   tokens    sorted key tokens with their title-id postings
+    titles: List[str] = []
+    keys: Dict[str, int] = {}
+    for title, aliases in entries:
+        title_id = len(titles)
+        titles.append(title)
+        for name in [title] + aliases:
+            key = catalog_key(name)
+            if key and key not in keys:
+                keys[key] = title_id
+    if sys.byteorder != 'little':
+        raise ValueError("catalog index is written little-endian")
+    sorted_keys = sorted(keys, key=lambda k: k.encode('utf-8'))
+    postings: Dict[str, set] = {}
+    for key in sorted_keys:
+        for token in key.split():
+            postings.setdefault(token, set()).add(keys[key])
+    tokens = sorted(postings, key=lambda t: t.encode('utf-8'))
+    posting_offsets = array('I', [0])
+    posting_ids = array('I')
+    for token in tokens:
+        posting_ids.extend(sorted(postings[token]))
+        posting_offsets.append(len(posting_ids))
+    sections = [
+        _strings([t.encode('utf-8') for t in titles]),
+        _strings([k.encode('utf-8') for k in sorted_keys]),
+        array('I', [keys[k] for k in sorted_keys]).tobytes(),
+        _strings([t.encode('utf-8') for t in tokens]) + posting_offsets.tobytes() + posting_ids.tobytes(),
+    ]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(str(path) + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(titles), *offsets, stamp))
+        for section in sections:
+            f.write(section)
+    tmp.replace(path)
+
+
+class _Strings:
+    def __init__(self, view: memoryview, offset: int):
+        count = struct.unpack_from('<I', view, offset)[0]
+        self.offsets = view[offset + 4:offset + 8 + 4 * count].cast('I')
+        self.blob = offset + 8 + 4 * count
+        self.view = view
+        self.end = self.blob + self.offsets[count] + (-self.offsets[count] % 4)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.view[self.blob + self.offsets[i]:self.blob + self.offsets[i + 1]])
+
+    def find(self, value: bytes) -> int:
+        i = bisect.bisect_left(self, value)
+        return i if i < len(self) and self[i] == value else -1
+
+    def prefix(self, value: bytes) -> range:
+        # UTF-8 never contains 0xff, so it sorts after every continuation.
+        return range(bisect.bisect_left(self, value), bisect.bisect_left(self, value + b'\xff'))
+
+
+class GameCatalog:
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < HEADER.size or view[:len(MAGIC)] != MAGIC:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{self.path} is not a game catalog index")
+        magic, count, titles, keys, key_ids, tokens, self.stamp = HEADER.unpack_from(view)
+        self._titles = _Strings(view, titles)
+        self._keys = _Strings(view, keys)
+        self._key_ids = view[key_ids:key_ids + 4 * len(self._keys)].cast('I')
+        self._tokens = _Strings(view, tokens)
+        n = len(self._tokens)
+        self._posting_offsets = view[self._tokens.end:self._tokens.end + 4 * (n + 1)].cast('I')
+        start = self._tokens.end + 4 * (n + 1)
+        self._postings = view[start:start + 4 * self._posting_offsets[n]].cast('I')
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["GameCatalog"]:
+        catalog_config = config.get('catalog', {}) or {}
+        source = catalog_config.get('source')
+        if not source:
+            return None
+        source = Path(source)
+        if not source.is_absolute():
+            source = Path(__file__).parent.parent / source
+        index = cache_dir(config) / "catalog.idx"
+        try:
+            stamp = source_stamp(source)
+            if index.exists():
+                try:
+                    catalog = cls(index)
+                except ValueError:
+                    catalog = None
+                if catalog is not None:
+                    if catalog.stamp == stamp:
+                        return catalog
+                    catalog.close()
+            build_index(load_entries(source), index, stamp)
+            return cls(index)
+        except (OSError, ValueError) as e:
+            print(f"  Catalog error: {e}")
+            return None
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def _title(self, title_id: int) -> str:
+        return self._titles[title_id].decode('utf-8')
+
+    def _posting(self, token_index: int) -> memoryview:
+        return self._postings[self._posting_offsets[token_index]:self._posting_offsets[token_index + 1]]
+
+    def resolve(self, term: str, limit: int = 5) -> List[str]:
+        # Names starting with the term, in key order (so an exact name or
+        # alias comes first, then its extensions), then names containing
+        # every term token, the last one as a prefix so a half-typed word
+        # still resolves, in catalog order.
+        key = catalog_key(term)
+        if not key or limit <= 0:
+            return []
+        found: List[int] = []
+        seen = set()
+
+        def take(ids):
+            for title_id in ids:
+                if len(found) >= limit:
+                    return
+                if title_id not in seen:
+                    seen.add(title_id)
+                    found.append(title_id)
+
+        take(self._key_ids[i] for i in self._keys.prefix(key.encode('utf-8')))
+        if len(found) < limit:
+            take(sorted(self._token_matches(key.split())))
+        return [self._title(i) for i in found]
+
+    def _token_matches(self, tokens: List[str]) -> set:
+        matches = None
+        for n, token in enumerate(tokens):
+            encoded = token.encode('utf-8')
+            if n == len(tokens) - 1:
+                spans = self._tokens.prefix(encoded)
+            else:
+                i = self._tokens.find(encoded)
+                spans = [i] if i >= 0 else []
+            ids = set()
+            for i in spans:
+                ids.update(self._posting(i))
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return set()
+        return matches
+
+    def close(self):
+        # Views into the map must go before it can be closed.
+        self._titles = self._keys = self._tokens = None
+        self._key_ids = self._postings = self._posting_offsets = None
+        self._mmap.close()
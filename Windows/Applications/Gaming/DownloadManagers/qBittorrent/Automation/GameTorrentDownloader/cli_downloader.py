@@ -1,8 +1,8 @@
+import asyncio
 import sys
 import os
 import yaml
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -17,7 +17,14 @@ from providers.nyaa import NyaaProvider
 from matching.normalizer import QueryNormalizer
 from matching.scorer import ConfidenceScorer
 from matching.game_detector import GameDetector
+from matching.parsed import TitleCache
 from ranking.ranker import Ranker
+from ranking.parallel import ParallelScorer
+from ranking.streaming import StreamingRanker
+from search.engine import SearchEngine
+from search.cache import ResultCache
+from search.planner import QueryPlanner
+from catalog import GameCatalog
 from qbittorrent.client import QBittorrentClient
 
 def load_config():
@@ -45,44 +52,126 @@ def get_providers(config: dict) -> list:
             print(f"  Failed to init {cls.name}: {e}")
     return providers
 
-def search_all_sources(providers: list, query: str, config: dict) -> list:
-    max_timeout = config.get('search', {}).get('timeout_per_source', 15)
-    all_results = []
-
-    available = []
-    for p in providers:
-        try:
-            if p.is_available():
-                available.append(p)
-                print(f"  [{p.name}] Online")
+async def search_and_rank(engine: SearchEngine, ranker: Ranker, term: str, expansions: list,
+                          config: dict, log=print) -> tuple:
+    streaming = StreamingRanker.from_config(ranker, term, config)
+    providers = await engine.available(log)
+    if not providers:
+        log("  WARNING: No search providers available!")
+        return streaming, []
+    pairs = engine.plan(providers, expansions)
+    naive_calls = len(providers) * len(expansions)
+    log(f"  Query plan: {len(pairs)} provider calls ({naive_calls - len(pairs)} saved of {naive_calls})")
+    stream = engine.stream(pairs, log, quiet=True)
+    try:
+        async for item in stream:
+            if item is None:
+                committed = await streaming.flush_async()
             else:
-                print(f"  [{p.name}] Offline")
-        except:
-            print(f"  [{p.name}] Offline")
+                provider, _, batch = item
+                committed = await streaming.add_async(provider.name, batch)
+            if committed:
+                confidence, best = streaming.top[0]
+                log(f"  Early commit: [{best.source}] confidence {confidence}, {best.seeders} seeders "
+                    f"after {len(streaming.sources)} source(s); cancelling outstanding searches")
+                break
+    finally:
+        await stream.aclose()
+    await streaming.flush_async()
+    return streaming, await asyncio.to_thread(streaming.ranked)
+
+async def process_term(engine: SearchEngine, normalizer: QueryNormalizer, ranker: Ranker,
+                       qb: QBittorrentClient, term: str, config: dict) -> tuple:
+    lines = []
+    try:
+        added = await find_and_add(engine, normalizer, ranker, qb, term, config, lines.append)
+    except Exception as e:
+        lines.append(f"  Error processing '{term}': {e}")
+        added = False
+    return lines, added
+
+async def find_and_add(engine: SearchEngine, normalizer: QueryNormalizer, ranker: Ranker,
+                       qb: QBittorrentClient, term: str, config: dict, log) -> bool:
+    confidence_threshold = config.get('search', {}).get('confidence_threshold', 50)
 
-    if not available:
-        print("  WARNING: No search providers available!")
-        return all_results
+    log(f"\n{'='*50}")
+    log(f"Searching for: {term}")
+
+    if normalizer.catalog is not None and not normalizer.catalog.resolve(term, 1):
+        log(f"  Not in local catalog: '{term}' (searching anyway)")
+    expansions = normalizer.expand(term)
+    log(f"  Query variants: {expansions}")
+
+    streaming, ranked = await search_and_rank(engine, ranker, term, expansions, config, log)
+
+    if not streaming.total:
+        log(f"  No results found for '{term}'")
+        return False
+
+    log(f"\n  Total raw results: {streaming.total}")
+    log(f"  After ranking: {len(ranked)} matches above threshold {confidence_threshold}")
+
+    if not ranked:
+        log(f"  No game matches found for '{term}'")
+        log("  Tip: Try a more specific name or check if the game is available as a torrent")
+        return False
+
+    best = ranked[0]
+    log(f"\n  BEST MATCH:")
+    log(f"    Title:    {best.title}")
+    log(f"    Seeders:  {best.seeders}")
+    log(f"    Leechers: {best.leechers}")
+    log(f"    Size:     {format_size(best.size_gb)}")
+    log(f"    Source:   {best.source}")
+    log(f"    Confidence: {streaming.matcher.score(best.title)}/100")
+
+    if await asyncio.to_thread(qb.add_torrent, best.url, best.title):
+        log(f"  >> ADDED TO QBITTORRENT!")
+        return True
+    log(f"  >> FAILED to add to qBittorrent")
+    return False
+
+async def run_batch(engine: SearchEngine, normalizer: QueryNormalizer, ranker: Ranker,
+                    qb: QBittorrentClient, search_terms: list, config: dict) -> int:
+    search_config = config.get('search', {})
+    in_flight = search_config.get('max_terms_in_flight', 4) if search_config.get('parallel', True) else 1
+    gate = asyncio.Semaphore(max(1, in_flight))
+
+    async def guarded(term):
+        async with gate:
+            return await process_term(engine, normalizer, ranker, qb, term, config)
+
+    tasks = [asyncio.ensure_future(guarded(term)) for term in search_terms]
+    success = 0
+    for task in tasks:
+        lines, added = await task
+        for line in lines:
+            print(line)
+        if added:
+            success += 1
+    return success
 
-    def do_search(provider):
-        try:
-            return provider.search(query)
-        except Exception as e:
-            print(f"  [{provider.name}] Error: {e}")
-            return []
-
-    with ThreadPoolExecutor(max_workers=len(available)) as executor:
-        futures = {executor.submit(do_search, p): p for p in available}
-        for future in as_completed(futures, timeout=max_timeout + 5):
-            provider = futures[future]
-            try:
-                results = future.result(timeout=max_timeout)
-                all_results.extend(results)
-                print(f"  [{provider.name}] Found {len(results)} results")
-            except Exception as e:
-                print(f"  [{provider.name}] Timeout/Error: {e}")
-
-    return all_results
+def print_health(providers: list):
+    summary = SearchProvider.health.summary()
+    for p in providers:
+        h = summary.get(p.name)
+        if h is None:
+            continue
+        p50 = h.latency_p50()
+        latency = f", p50 {p50*1000:.0f} ms" if p50 is not None else ""
+        print(f"  [{p.name}] {h.state}: {h.successes} ok, {h.failures} failed{latency}")
+
+def print_connection_reuse():
+    if SearchProvider.transport is None:
+        return
+    for host, counts in sorted(SearchProvider.transport.stats().items()):
+        print(f"  [{host}] {counts['requests']} requests over {counts['connections']} connections ({counts['reused']} reused)")
+
+def print_rate_limits():
+    if SearchProvider.transport is None:
+        return
+    for host, limits in sorted(SearchProvider.transport.limiter.limits().items()):
+        print(f"  [{host}] {limits['rate']} req/s, concurrency {limits['concurrency']}, {limits['throttled']} throttled")
 
 def format_size(gb):
     if gb >= 1:
@@ -100,11 +189,13 @@ def main():
 
     config = load_config()
     aliases = config.get('aliases', {})
-    confidence_threshold = config.get('search', {}).get('confidence_threshold', 50)
 
-    normalizer = QueryNormalizer(aliases)
-    scorer = ConfidenceScorer(normalizer)
-    ranker = Ranker(normalizer, scorer)
+    catalog = GameCatalog.from_config(config)
+    if catalog is not None:
+        print(f"Local catalog: {len(catalog)} titles")
+    normalizer = QueryNormalizer(aliases, catalog, (config.get('catalog', {}) or {}).get('max_expansions', 2))
+    scorer = ConfidenceScorer(normalizer, TitleCache.from_config(config))
+    ranker = Ranker(normalizer, scorer, ParallelScorer.from_config(config, catalog))
     detector = GameDetector()
     qb = QBittorrentClient(config)
 
@@ -114,51 +205,28 @@ def main():
     qb.configure()
 
     providers = get_providers(config)
+    for p in providers:
+        p.scorer = scorer
     print(f"\nAvailable providers: {len(providers)}")
-
-    success = 0
-    for term in search_terms:
-        print(f"\n{'='*50}")
-        print(f"Searching for: {term}")
-
-        expansions = normalizer.expand(term)
-        print(f"  Query variants: {expansions}")
-
-        all_results = []
-        for expansion in expansions:
-            results = search_all_sources(providers, expansion, config)
-            all_results.extend(results)
-
-        if not all_results:
-            print(f"  No results found for '{term}'")
-            continue
-
-        print(f"\n  Total raw results: {len(all_results)}")
-
-        ranked = ranker.rank(term, all_results, confidence_threshold)
-        print(f"  After ranking: {len(ranked)} matches above threshold {confidence_threshold}")
-
-        if not ranked:
-            print(f"  No game matches found for '{term}'")
-            print("  Tip: Try a more specific name or check if the game is available as a torrent")
-            continue
-
-        best = ranked[0]
-        print(f"\n  BEST MATCH:")
-        print(f"    Title:    {best.title}")
-        print(f"    Seeders:  {best.seeders}")
-        print(f"    Leechers: {best.leechers}")
-        print(f"    Size:     {format_size(best.size_gb)}")
-        print(f"    Source:   {best.source}")
-        print(f"    Confidence: {scorer.score(term, best.title)}/100")
-
-        if qb.add_torrent(best.url, best.title):
-            print(f"  >> ADDED TO QBITTORRENT!")
-            success += 1
-        else:
-            print(f"  >> FAILED to add to qBittorrent")
-
+    engine = SearchEngine(providers, config, ResultCache.from_config(config), QueryPlanner(normalizer, config))
+
+    try:
+        success = engine.run(run_batch(engine, normalizer, ranker, qb, search_terms, config))
+    finally:
+        engine.close()
+        if ranker.parallel is not None:
+            ranker.parallel.close()
     print(f"\n{'='*50}")
+    if engine.cache is not None:
+        print(f"Search cache: {engine.cache.summary()}")
+    print(f"In-flight coalescing: {engine.flights.summary()}")
+    print(f"Title cache: {scorer.titles.summary()}")
+    print("Provider health:")
+    print_health(providers)
+    print("Connection reuse:")
+    print_connection_reuse()
+    print("Rate limits:")
+    print_rate_limits()
     print(f"=== Done: {success}/{len(search_terms)} games added ===")
     sys.exit(0 if success == len(search_terms) else 1)
 
@@ -0,0 +1,68 @@
+# matching/alignment.py
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Set
+
+# Above this many tokens a title gets a position index instead of being
+# scanned once per query token.
+LONG_TITLE_TOKENS = 64
+
+
+def token_positions(ids: Iterable[int], wanted: Set[int]) -> Dict[int, List[int]]:
+    positions: Dict[int, List[int]] = {}
+    for i, token_id in enumerate(ids):
+        if token_id in wanted:
+            found = positions.get(token_id)
+            if found is None:
+                positions[token_id] = [i]
+            else:
+                found.append(i)
+    return positions
+
+
+class Alignment:
+    # Where the tokens a compiled query asks about sit in one title. Short
+    # titles are searched in place with array.count/index, which costs at
+    # most LONG_TITLE_TOKENS steps per lookup. Longer ones are indexed in a
+    # single pass over the title, after which a count is a dict lookup and
+    # the ordered check is one bisect per query token: O(n + q log n) in all.
+    __slots__ = ('ids', 'positions')
+
+    def __init__(self, ids: array, wanted: Set[int]):
+        self.ids = ids
+        self.positions: Optional[Dict[int, List[int]]] = (
+            token_positions(ids, wanted) if len(ids) > LONG_TITLE_TOKENS else None
+        )
+
+    def count(self, token_id: int) -> int:
+        if self.positions is None:
+            return self.ids.count(token_id)
+        return len(self.positions.get(token_id, ()))
+
+    def matched(self, counts: Dict[int, int]) -> int:
+        # Each title token can pair with one query token, so this is the
+        # count the old greedy claim-a-position loop arrived at.
+        return sum(min(count, self.count(token_id)) for token_id, count in counts.items())
+
+    def contains(self, counts: Dict[int, int]) -> bool:
+        return all(self.count(token_id) >= count for token_id, count in counts.items())
+
+    def ordered(self, query_ids: Iterable[int]) -> bool:
+        # Greedy: taking the earliest occurrence after the previous match
+        # never rules out a later one, so this finds the query as a
+        # subsequence whenever one exists.
+        last = -1
+        if self.positions is None:
+            for token_id in query_ids:
+                try:
+                    last = self.ids.index(token_id, last + 1)
+                except ValueError:
+                    return False
+            return True
+        for token_id in query_ids:
+            found = self.positions.get(token_id, ())
+            i = bisect_right(found, last)
+            if i == len(found):
+                return False
+            last = found[i]
+        return True
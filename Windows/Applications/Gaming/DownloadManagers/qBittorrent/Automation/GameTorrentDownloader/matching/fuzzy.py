@@ -0,0 +1,125 @@
+# matching/fuzzy.py
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+DIGIT = re.compile(r'\d')
+
+
+def edit_bound(token: str) -> int:
+    # Short words and anything with a digit must match exactly: "gate" vs
+    # "game" or "witcher2" vs "witcher3" are different titles.
+    if len(token) < 5 or DIGIT.search(token):
+        return 0
+    return 1 if len(token) < 9 else 2
+
+
+def distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    # With a limit, gives up as soon as every cell of a row exceeds it and
+    # returns limit + 1.
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def near(a: str, b: str, limit: int) -> bool:
+    # Typos rarely hit the first letter; requiring it keeps "elden" from
+    # matching "golden".
+    return a[:1] == b[:1] and abs(len(a) - len(b)) <= limit and distance(a, b, limit) <= limit
+
+
+class NearIndex:
+    # Words bucketed by first letter and length, the two things near()
+    # requires before it computes a distance. Building it is one dict insert
+    # per word; a search only visits the 2 * limit + 1 buckets it can match.
+    def __init__(self, words: Iterable[str] = ()):
+        self.buckets: Dict[Tuple[str, int], List[str]] = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        self.buckets.setdefault((word[:1], len(word)), []).append(word)
+
+    def search(self, word: str, limit: int) -> List[str]:
+        found = []
+        for size in range(len(word) - limit, len(word) + limit + 1):
+            for candidate in self.buckets.get((word[:1], size), ()):
+                if distance(word, candidate, limit) <= limit:
+                    found.append(candidate)
+        return found
+
+
+def fuzzy_candidate(token: str) -> bool:
+    # The shortest title token a five-letter query word can be one edit from.
+    return len(token) >= 4 and not DIGIT.search(token)
+
+
+def coverage(query_tokens: List[str], tokens: List[str]) -> int:
+    # Number of query tokens that appear in tokens exactly, as two adjacent
+    # tokens run together ("witcher 3" / "witcher3", either way round), or
+    # within edit_bound() edits of a title token without digits.
+    present = set(tokens)
+    joined = {a + b for a, b in zip(tokens, tokens[1:])}
+    fuzzy = None
+    covered = 0
+    for i, q in enumerate(query_tokens):
+        if (q in present or q in joined
+                or (i > 0 and query_tokens[i - 1] + q in present)
+                or (i + 1 < len(query_tokens) and q + query_tokens[i + 1] in present)):
+            covered += 1
+            continue
+        limit = edit_bound(q)
+        if limit:
+            if fuzzy is None:
+                fuzzy = [t for t in present if fuzzy_candidate(t)]
+            if any(near(q, t, limit) for t in fuzzy):
+                covered += 1
+    return covered
+
+
+def coverage_many(query_tokens: List[str], matrix: np.ndarray, vocab: Dict[str, int],
+                  rows: Optional[np.ndarray] = None) -> np.ndarray:
+    # coverage() for every row of a token-id matrix (-1 padded). Near-matches
+    # come from a NearIndex over the batch's fuzzy-eligible tokens, so each
+    # query token is compared only with tokens near() could accept.
+    if rows is not None:
+        matrix = matrix[rows]
+    n = matrix.shape[0]
+    covered = np.zeros(n, dtype=np.int64)
+    if not n or not matrix.shape[1]:
+        return covered
+    names = list(vocab)
+    used = np.unique(matrix[matrix >= 0])
+    index = None
+
+    def has(ids) -> np.ndarray:
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return np.zeros(n, dtype=bool)
+        return np.isin(matrix, ids).any(1)
+
+    for i, q in enumerate(query_tokens):
+        hit = has([vocab.get(q)])
+        if i > 0:
+            hit |= has([vocab.get(query_tokens[i - 1] + q)])
+        if i + 1 < len(query_tokens):
+            hit |= has([vocab.get(q + query_tokens[i + 1])])
+        for cut in range(1, len(q)):
+            a, b = vocab.get(q[:cut]), vocab.get(q[cut:])
+            if a is not None and b is not None:
+                hit |= ((matrix[:, :-1] == a) & (matrix[:, 1:] == b)).any(1)
+        limit = edit_bound(q)
+        if limit and not hit.all():
+            if index is None:
+                index = NearIndex(names[t] for t in used if fuzzy_candidate(names[t]))
+            hit |= has([vocab[t] for t in index.search(q, limit)])
+        covered += hit
+    return covered
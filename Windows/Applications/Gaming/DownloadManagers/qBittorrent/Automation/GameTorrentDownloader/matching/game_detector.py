@@ -1,49 +1,8 @@
-import re
-
-MOVIE_VIDEO_MARKERS = [
-    '1080p', '720p', '2160p', '4k', 'web-dl', 'webrip', 'bluray', 'bdrip',
-    'dvdrip', 'h264', 'h265', 'hevc', 'x264', 'x265', 'xvid', 'brrip',
-    'hdtv', 'remux', 'hdrip', 'cam', 'hdcam', 'ts', 'tc', 'screener',
-    'dts', 'dolby', 'atmos', '5.1', '7.1', 'subbed', 'dubbed',
-    'extended', 'theatrical', 'directors cut', 'unrated', 'imax',
-    'web', 'webhd', 'hdrip', 'bdrip', 'brrip', 'dvd', 'hddvd',
-    'proper', 'rerip', 'rarbg', 'yify', 'yts',
-]
-
-MOVIE_YEAR_PATTERN = re.compile(r'[\.\s\[\(](19|20)\d{2}[\.\s\]\)]')
-
-TV_MARKERS = [
-    's01e', 's02e', 's03e', 's04e', 's05e', 's06e', 's07e', 's08e',
-    's09e', 's10e', 's11e', 's12e', 'season', 'series', 'episode',
-    'ep01', 'ep02', 'complete series', 'all seasons'
-]
-
-JUNK_MARKERS = [
-    'wallpaper', 'strategy guide', 'artbook', 'subtitle',
-    'ebook', 'manual', 'trainer', 'cheat', 'save game',
-    ' cracked', 'crack only', 'keygen', 'keymaker', 'patch only'
-]
-
-GAME_REPACK_GROUPS = [
-    'fitgirl', 'dodi', 'tenoke', 'reloaded', 'kaos', 'empress',
-    'elamigos', 'razor1911', 'codex', 'cpy', 'skidrow', 'plaza',
-    'corepack', 'rune', 'mercs', 'iso', 'gog', 'steamrip',
-    'rgmechanics', 'bgm', 'chronos', 'dodigames', 'fckdrm',
-    'goggame', 'pooeen', 'xatab', 'russianduck', 'mechanics',
-]
-
-GAME_EDITION_MARKERS = [
-    'goty', 'deluxe', 'ultimate', 'dlc', 'complete edition',
-    'premium edition', 'gold edition', 'definitive', 'enhanced edition',
-    'game of the year', 'digital deluxe', 'legacy', 'collection',
-    'anthology', 'bundle', 'pack',
-]
-
-GAME_PLATFORM_MARKERS = [
-    'pc game', 'pc dvd', 'pc iso', 'windows', 'steam', 'epic games',
-    'gog', 'origin', 'uplay', 'rockstar', 'battle.net', 'battlenet',
-    'game', 'steamrip',
-]
+from typing import List
+import numpy as np
+from .markers import (TokenHaystack, MOVIE_VIDEO_MARKERS, TV_MARKERS, JUNK_MARKERS, GAME_REPACK_GROUPS,
+                      GAME_EDITION_MARKERS, GAME_PLATFORM_MARKERS, MOVIE, TV, JUNK, GROUP, EDITION, PLATFORM)
+from .parsed import TitleCache, ParsedTitle, MOVIE_YEAR_PATTERN
 
 GAME_EXTENSIONS = ['.iso', '.bin', '.exe', '.msi', '.nsp', '.xci', '.cia',
                    '.pkg', '.rap', '.edat', '.iso.xdelta']
@@ -51,56 +10,48 @@ GAME_EXTENSIONS = ['.iso', '.bin', '.exe', '.msi', '.nsp', '.xci', '.cia',
 GAME_SIZE_MIN_GB = 1.0
 GAME_SIZE_MAX_GB = 150.0
 
+GAME_EXTENSION_SUFFIXES = tuple(GAME_EXTENSIONS)
+
 
 class GameDetector:
+    def __init__(self, titles: TitleCache = None):
+        self.titles = titles if titles is not None else TitleCache()
+
     def _has_game_group(self, name: str) -> bool:
-        n = name.lower()
-        return any(g in n for g in GAME_REPACK_GROUPS)
+        return bool(self.titles.get(name).markers & GROUP)
 
     def _has_movie_markers(self, name: str) -> bool:
-        n = name.lower()
-        movie_count = sum(1 for s in MOVIE_VIDEO_MARKERS if s in n)
-        return movie_count >= 1
+        return bool(self.titles.get(name).markers & MOVIE)
 
     def _has_year(self, name: str) -> bool:
         return bool(MOVIE_YEAR_PATTERN.search(name.lower()))
 
     def is_game(self, name: str) -> bool:
-        n = name.lower().strip()
+        return self.classify_game(self.titles.get(name))
 
-        for marker in TV_MARKERS:
-            if marker in n:
-                return False
+    def is_definitely_not_game(self, name: str) -> bool:
+        return self.classify_not_game(self.titles.get(name))
 
-        for marker in JUNK_MARKERS:
-            if marker in n:
-                return False
+    def classify_game(self, parsed: ParsedTitle) -> bool:
+        hits = parsed.markers
 
-        for ext in GAME_EXTENSIONS:
-            if n.rstrip().endswith(ext):
-                return True
+        if hits & (TV | JUNK):
+            return False
 
-        if self._has_game_group(n):
+        if parsed.lower.endswith(GAME_EXTENSION_SUFFIXES):
             return True
 
-        for marker in GAME_EDITION_MARKERS:
-            if marker in n:
-                return True
-
-        for marker in GAME_PLATFORM_MARKERS:
-            if marker in n:
-                return True
+        if hits & (GROUP | EDITION | PLATFORM):
+            return True
 
-        if self._has_movie_markers(n):
+        if hits & MOVIE:
             return False
 
-        if self._has_year(n):
+        if parsed.year:
             return False
 
-        size_match = re.search(r'(\d+\.?\d*)\s*(gb|mb|tb)', n)
-        if size_match:
-            size_val = float(size_match.group(1))
-            size_unit = size_match.group(2)
+        if parsed.size:
+            size_val, size_unit = parsed.size
             if size_unit == 'gb' and GAME_SIZE_MIN_GB <= size_val <= GAME_SIZE_MAX_GB:
                 return True
             if size_unit == 'tb' and size_val <= 1:
@@ -108,30 +59,70 @@ class GameDetector:
 
         return False
 
-    def is_definitely_not_game(self, name: str) -> bool:
-        n = name.lower().strip()
+    def classify_not_game(self, parsed: ParsedTitle) -> bool:
+        hits = parsed.markers
 
-        if self._has_game_group(n):
+        if hits & GROUP:
             return False
 
-        for marker in MOVIE_VIDEO_MARKERS:
-            if marker in n:
-                return True
+        if hits & MOVIE:
+            return True
 
-        if self._has_year(n):
+        if parsed.year:
             return True
 
-        for marker in TV_MARKERS:
-            if marker in n:
-                return True
+        if hits & TV:
+            return True
 
-        size_match = re.search(r'(\d+\.?\d*)\s*(gb|mb|tb)', n)
-        if size_match:
-            size_val = float(size_match.group(1))
-            size_unit = size_match.group(2)
+        if parsed.size:
+            size_val, size_unit = parsed.size
             if size_unit == 'mb' and size_val < 500:
                 return True
             if size_unit == 'gb' and size_val < 1.0:
                 return True
 
         return False
+
+    def is_game_many(self, names: List[str]) -> np.ndarray:
+        return self.classify_game_many(self.titles.get_many(names))
+
+    def is_definitely_not_game_many(self, names: List[str]) -> np.ndarray:
+        return self.classify_not_game_many(self.titles.get_many(names))
+
+    def classify_game_many(self, parsed: List[ParsedTitle]) -> np.ndarray:
+        haystack = TokenHaystack([p.lower for p in parsed])
+        rejected = haystack.contains(TV | JUNK)
+        extension = np.fromiter((p.lower.endswith(GAME_EXTENSION_SUFFIXES) for p in parsed), dtype=bool,
+                                count=len(parsed))
+        accepted = extension | haystack.contains(GROUP | EDITION | PLATFORM)
+        result = ~rejected & accepted
+        undecided = ~rejected & ~accepted & ~haystack.contains(MOVIE)
+        undecided &= haystack.contains_any(['gb', 'tb'])
+        for i in np.flatnonzero(undecided):
+            p = parsed[i]
+            if p.year or not p.size:
+                continue
+            size_val, size_unit = p.size
+            if size_unit == 'gb' and GAME_SIZE_MIN_GB <= size_val <= GAME_SIZE_MAX_GB:
+                result[i] = True
+            elif size_unit == 'tb' and size_val <= 1:
+                result[i] = True
+        return result
+
+    def classify_not_game_many(self, parsed: List[ParsedTitle]) -> np.ndarray:
+        haystack = TokenHaystack([p.lower for p in parsed])
+        candidates = ~haystack.contains(GROUP)
+        result = candidates & haystack.contains(MOVIE | TV)
+        undecided = candidates & ~result
+        year_rows = undecided & haystack.contains_any(['19', '20'])
+        size_rows = undecided & haystack.contains_any(['mb', 'gb'])
+        for i in np.flatnonzero(year_rows | size_rows):
+            p = parsed[i]
+            if year_rows[i] and p.year:
+                result[i] = True
+                continue
+            if size_rows[i] and p.size:
+                size_val, size_unit = p.size
+                if (size_unit == 'mb' and size_val < 500) or (size_unit == 'gb' and size_val < 1.0):
+                    result[i] = True
+        return result
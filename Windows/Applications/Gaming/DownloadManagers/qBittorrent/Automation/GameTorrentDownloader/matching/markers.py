@@ -0,0 +1,195 @@
+# matching/markers.py
+import re
+from collections import deque
+from typing import Dict, List
+import numpy as np
+
+MOVIE_VIDEO_MARKERS = [
+    '1080p', '720p', '2160p', '4k', 'web-dl', 'webrip', 'bluray', 'bdrip',
+    'dvdrip', 'h264', 'h265', 'hevc', 'x264', 'x265', 'xvid', 'brrip',
+    'hdtv', 'remux', 'hdrip', 'cam', 'hdcam', 'ts', 'tc', 'screener',
+    'dts', 'dolby', 'atmos', '5.1', '7.1', 'subbed', 'dubbed',
+    'extended', 'theatrical', 'directors cut', 'unrated', 'imax',
+    'web', 'webhd', 'hdrip', 'bdrip', 'brrip', 'dvd', 'hddvd',
+    'proper', 'rerip', 'rarbg', 'yify', 'yts',
+]
+
+TV_MARKERS = [
+    's01e', 's02e', 's03e', 's04e', 's05e', 's06e', 's07e', 's08e',
+    's09e', 's10e', 's11e', 's12e', 'season', 'series', 'episode',
+    'ep01', 'ep02', 'complete series', 'all seasons'
+]
+
+JUNK_MARKERS = [
+    'wallpaper', 'strategy guide', 'artbook', 'subtitle',
+    'ebook', 'manual', 'trainer', 'cheat', 'save game',
+    ' cracked', 'crack only', 'keygen', 'keymaker', 'patch only'
+]
+
+GAME_REPACK_GROUPS = [
+    'fitgirl', 'dodi', 'tenoke', 'reloaded', 'kaos', 'empress',
+    'elamigos', 'razor1911', 'codex', 'cpy', 'skidrow', 'plaza',
+    'corepack', 'rune', 'mercs', 'iso', 'gog', 'steamrip',
+    'rgmechanics', 'bgm', 'chronos', 'dodigames', 'fckdrm',
+    'goggame', 'pooeen', 'xatab', 'russianduck', 'mechanics',
+]
+
+GAME_EDITION_MARKERS = [
+    'goty', 'deluxe', 'ultimate', 'dlc', 'complete edition',
+    'premium edition', 'gold edition', 'definitive', 'enhanced edition',
+    'game of the year', 'digital deluxe', 'legacy', 'collection',
+    'anthology', 'bundle', 'pack',
+]
+
+GAME_PLATFORM_MARKERS = [
+    'pc game', 'pc dvd', 'pc iso', 'windows', 'steam', 'epic games',
+    'gog', 'origin', 'uplay', 'rockstar', 'battle.net', 'battlenet',
+    'game', 'steamrip',
+]
+
+# The confidence scorer keeps its own, shorter lists and checks them
+# against the normalized title rather than the lowercased name.
+SCORE_MOVIE_MARKERS = ['1080p','720p','2160p','web-dl','bluray','x264','x265','h264','h265','dvdrip','webrip','bdrip','brrip','hevc','remux','xvid','hdtv']
+SCORE_GROUP_MARKERS = ['fitgirl','dodi','tenoke','reloaded','kaos','empress','elamigos','razor1911','codex','cpy','skidrow','plaza','corepack','rune','mercs','rgmechanics','mechanics','chronos']
+SCORE_EDITION_MARKERS = ['goty','deluxe','ultimate','dlc','complete','premium','definitive','enhanced','collection','anthology','digital deluxe']
+SCORE_PLATFORM_MARKERS = ['pc game','pc dvd','pc iso','steam','gog','epic','origin','windows','game','repack','steamrip']
+
+MOVIE = 1 << 0
+TV = 1 << 1
+JUNK = 1 << 2
+GROUP = 1 << 3
+EDITION = 1 << 4
+PLATFORM = 1 << 5
+SCORE_MOVIE = 1 << 6
+SCORE_GROUP = 1 << 7
+SCORE_EDITION = 1 << 8
+SCORE_PLATFORM = 1 << 9
+
+MARKER_TABLES = {
+    MOVIE: MOVIE_VIDEO_MARKERS,
+    TV: TV_MARKERS,
+    JUNK: JUNK_MARKERS,
+    GROUP: GAME_REPACK_GROUPS,
+    EDITION: GAME_EDITION_MARKERS,
+    PLATFORM: GAME_PLATFORM_MARKERS,
+    SCORE_MOVIE: SCORE_MOVIE_MARKERS,
+    SCORE_GROUP: SCORE_GROUP_MARKERS,
+    SCORE_EDITION: SCORE_EDITION_MARKERS,
+    SCORE_PLATFORM: SCORE_PLATFORM_MARKERS,
+}
+
+
+class MarkerAutomaton:
+    # Aho-Corasick over every marker table. scan() walks the text once and
+    # returns the OR of the category bits of every marker found, so its cost
+    # does not depend on how many markers there are.
+    def __init__(self, tables: Dict[int, List[str]]):
+        goto: List[Dict[str, int]] = [{}]
+        out = [0]
+        self.phrases: Dict[int, List[str]] = {}
+        for category, markers in tables.items():
+            for marker in markers:
+                state = 0
+                for ch in marker:
+                    if ch not in goto[state]:
+                        goto.append({})
+                        out.append(0)
+                        goto[state][ch] = len(goto) - 1
+                    state = goto[state][ch]
+                out[state] |= category
+                if any(c.isspace() for c in marker):
+                    self.phrases.setdefault(category, []).append(marker)
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            out[state] |= out[fail[state]]
+            for ch, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(ch, 0)
+                queue.append(child)
+        self._delta = delta
+        self._out = out
+
+    def scan(self, text: str) -> int:
+        delta, out = self._delta, self._out
+        state = hits = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            hits |= out[state]
+        return hits
+
+
+MARKERS = MarkerAutomaton(MARKER_TABLES)
+
+
+def encode_tokens(rows: List[str]):
+    flat = ' '.join(rows).split()
+    lengths = np.fromiter(map(len, map(str.split, rows)), dtype=np.int64, count=len(rows))
+    vocab = {t: i for i, t in enumerate(dict.fromkeys(flat))}
+    width = int(lengths.max()) if len(rows) else 0
+    matrix = np.full((len(rows), width), -1, dtype=np.int32)
+    matrix[np.arange(width) < lengths[:, None]] = np.fromiter(map(vocab.__getitem__, flat), dtype=np.int32,
+                                                              count=len(flat))
+    return matrix, lengths, vocab
+
+
+class TokenHaystack:
+    # Batch marker tests over many rows. A marker without whitespace can only
+    # occur inside a single whitespace-separated token, so the automaton runs
+    # once per distinct token; markers with spaces scan the joined rows.
+    def __init__(self, rows: List[str], matrix: np.ndarray = None, tokens: List[str] = None):
+        self.rows = rows
+        if matrix is None:
+            matrix, _, vocab = encode_tokens(rows)
+            tokens = list(vocab)
+        self.matrix = matrix
+        self.tokens = tokens
+        self._token_hits = None
+        self._joined_rows = None
+        self._joined_tokens = None
+
+    @staticmethod
+    def _joined(texts: List[str]):
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+        return '\n'.join(texts), np.cumsum(lengths) - lengths
+
+    @staticmethod
+    def _hits(joined, marker: str) -> np.ndarray:
+        text, starts = joined
+        positions = [m.start() for m in re.finditer(re.escape(marker), text)]
+        return np.searchsorted(starts, positions, side='right') - 1
+
+    def _phrase_rows(self, found: np.ndarray, phrases: List[str]):
+        for phrase in phrases:
+            if self._joined_rows is None:
+                self._joined_rows = self._joined(self.rows)
+            found[self._hits(self._joined_rows, phrase)] = True
+
+    def contains(self, categories: int) -> np.ndarray:
+        if self._token_hits is None:
+            self._token_hits = np.fromiter(map(MARKERS.scan, self.tokens), dtype=np.int64, count=len(self.tokens))
+            self._token_hits = np.append(self._token_hits, 0)
+        found = np.zeros(len(self.rows), dtype=bool)
+        if self.matrix.shape[1]:
+            found |= (self._token_hits[self.matrix] & categories).any(1)
+        for category, phrases in MARKERS.phrases.items():
+            if category & categories:
+                self._phrase_rows(found, phrases)
+        return found
+
+    def contains_any(self, markers: List[str]) -> np.ndarray:
+        flags = np.zeros(len(self.tokens) + 1, dtype=bool)
+        found = np.zeros(len(self.rows), dtype=bool)
+        for marker in markers:
+            if any(c.isspace() for c in marker):
+                self._phrase_rows(found, [marker])
+            else:
+                if self._joined_tokens is None:
+                    self._joined_tokens = self._joined(self.tokens)
+                flags[self._hits(self._joined_tokens, marker)] = True
+        if self.matrix.shape[1]:
+            found |= flags[self.matrix].any(1)
+        return found
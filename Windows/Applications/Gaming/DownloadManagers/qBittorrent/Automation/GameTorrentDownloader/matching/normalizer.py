@@ -22,10 +22,20 @@ ROMAN_TO阿拉伯数字 = {
     'xvi': '16', 'xvii': '17', 'xviii': '18', 'xix': '19', 'xx': '20',
 }
 
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+VERSION_TOKEN_PATTERN = re.compile(r'^v?\d+\.\d+(\.\d+)?$')
+
+
+def normalize(text: str) -> str:
+    # split()/join() collapses and strips the same whitespace as \s+
+    return ' '.join(NON_WORD_PATTERN.sub(' ', text.lower()).split())
+
 
 class QueryNormalizer:
-    def __init__(self, aliases: dict):
+    def __init__(self, aliases: dict, catalog=None, catalog_expansions: int = 2):
         self.aliases = aliases
+        self.catalog = catalog
+        self.catalog_expansions = catalog_expansions
         self._build_reverse_aliases()
 
     def _build_reverse_aliases(self):
@@ -35,12 +45,33 @@ class QueryNormalizer:
                 key = alias.lower().strip()
                 if key not in self.reverse_aliases:
                     self.reverse_aliases[key] = canonical.lower().strip()
+        self._build_index()
+
+    def _build_index(self):
+        # expand() used to walk the whole catalog per query. These maps are
+        # keyed by what it compared against, holding entry positions in
+        # catalog order, so a lookup only visits entries that can match.
+        self._normalized_lists = {k: [normalize(a) for a in v] for k, v in self.aliases.items()}
+        self._reverse_entries = []
+        self._reverse_by_key = {}
+        self._reverse_by_token = {}
+        for i, (key, canonical) in enumerate(self.reverse_aliases.items()):
+            self._reverse_entries.append(self._normalized_lists.get(canonical))
+            self._reverse_by_key[key] = i
+            for token in dict.fromkeys(key.split()):
+                self._reverse_by_token.setdefault(token, []).append(i)
+        self._canonical_entries = []
+        self._by_canonical = {}
+        self._by_alias = {}
+        for j, (canonical, alias_list) in enumerate(self.aliases.items()):
+            canonical_norm = normalize(canonical)
+            self._canonical_entries.append((canonical_norm, self._normalized_lists[canonical]))
+            self._by_canonical.setdefault(canonical_norm, []).append(j)
+            for a_norm in dict.fromkeys(self._normalized_lists[canonical]):
+                self._by_alias.setdefault(a_norm, []).append(j)
 
     def normalize(self, text: str) -> str:
-        text = text.lower().strip()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        return normalize(text)
 
     def normalize_roman(self, text: str) -> str:
         text = self.normalize(text)
@@ -56,13 +87,13 @@ class QueryNormalizer:
     def tokenize(self, text: str) -> list:
         text = self.normalize(text)
         tokens = text.split()
-        tokens = [t for t in tokens if not re.match(r'^v?\d+\.\d+(\.\d+)?$', t)]
+        tokens = [t for t in tokens if not VERSION_TOKEN_PATTERN.match(t)]
         return tokens
 
     def tokenize_with_roman(self, text: str) -> list:
         text = self.normalize_roman(text)
         tokens = text.split()
-        tokens = [t for t in tokens if not re.match(r'^v?\d+\.\d+(\.\d+)?$', t)]
+        tokens = [t for t in tokens if not VERSION_TOKEN_PATTERN.match(t)]
         return tokens
 
     def normalize_edition(self, text: str) -> str:
@@ -72,32 +103,40 @@ class QueryNormalizer:
                 return val
         return text_lower
 
+    def catalog_names(self, query: str) -> list:
+        if self.catalog is None:
+            return []
+        return [self.normalize(title) for title in self.catalog.resolve(query, self.catalog_expansions)]
+
     def expand(self, query: str) -> list:
         query_norm = self.normalize(query)
         expansions = [query_norm]
+        seen = {query_norm}
 
-        for alias_key, canonical in self.reverse_aliases.items():
-            if alias_key == query_norm or query_norm in alias_key.split():
-                canonical_entry = self.aliases.get(canonical, self.aliases.get(query_norm, []))
-                for a in canonical_entry:
-                    a_norm = self.normalize(a)
-                    if a_norm not in expansions:
-                        expansions.append(a_norm)
+        def add(values):
+            for value in values:
+                if value not in seen:
+                    seen.add(value)
+                    expansions.append(value)
 
-        for canonical, alias_list in self.aliases.items():
-            canonical_norm = self.normalize(canonical)
+        matches = set(self._reverse_by_token.get(query_norm, ()))
+        if query_norm in self._reverse_by_key:
+            matches.add(self._reverse_by_key[query_norm])
+        for i in sorted(matches):
+            entry = self._reverse_entries[i]
+            if entry is None:
+                entry = self._normalized_lists.get(query_norm, [])
+            add(entry)
+
+        matches = set(self._by_canonical.get(query_norm, ())) | set(self._by_alias.get(query_norm, ()))
+        for j in sorted(matches):
+            canonical_norm, alias_norms = self._canonical_entries[j]
             if canonical_norm == query_norm:
-                for a in alias_list:
-                    a_norm = self.normalize(a)
-                    if a_norm not in expansions:
-                        expansions.append(a_norm)
-            for a in alias_list:
-                if self.normalize(a) == query_norm:
-                    if canonical_norm not in expansions:
-                        expansions.append(canonical_norm)
-                    for a2 in alias_list:
-                        a2_norm = self.normalize(a2)
-                        if a2_norm not in expansions:
-                            expansions.append(a2_norm)
+                add(alias_norms)
+            if query_norm in alias_norms:
+                add([canonical_norm])
+                add(alias_norms)
+
+        add(self.catalog_names(query))
 
         return expansions
@@ -0,0 +1,152 @@
+# matching/parsed.py
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from .normalizer import normalize, VERSION_TOKEN_PATTERN
+from .markers import MARKERS
+from .vocab import TokenVocabulary, VOCAB
+
+SIZE_PATTERN = re.compile(r'(\d+\.?\d*)\s*(gb|mb|tb)')
+MOVIE_YEAR_PATTERN = re.compile(r'[\.\s\[\(](19|20)\d{2}[\.\s\]\)]')
+YEAR_PATTERN = re.compile(r'[\.\s\[\(]((?:19|20)\d{2})[\.\s\]\)]')
+VERSION_PATTERN = re.compile(r'v(\d+\.\d+)')
+
+
+def _size(text: str) -> Optional[Tuple[float, str]]:
+    m = SIZE_PATTERN.search(text)
+    return (float(m.group(1)), m.group(2)) if m else None
+
+
+class _lazy:
+    # Like functools.cached_property, minus the per-instance lock that makes
+    # the 3.11 version several times slower on first access.
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.func(obj)
+        return value
+
+
+class ParsedTitle:
+    # Everything the detector and scorer derive from a release title. Each
+    # feature is computed on first use and then kept with the title. The
+    # detector reads the lowercased name, the scorer the normalized one.
+    def __init__(self, title: str, vocab: TokenVocabulary = VOCAB):
+        self.title = title
+        self.vocab = vocab
+        self.normalized = normalize(title)
+
+    @_lazy
+    def lower(self) -> str:
+        return self.title.lower().strip()
+
+    @_lazy
+    def token_ids(self) -> array:
+        return self.vocab.encode(t for t in self.normalized.split() if not VERSION_TOKEN_PATTERN.match(t))
+
+    @_lazy
+    def roman_ids(self) -> array:
+        # Most titles have no roman numerals; those share one array.
+        ids = self.token_ids
+        roman = self.vocab.roman
+        if not any(i in roman for i in ids):
+            return ids
+        return array('i', [roman.get(i, i) for i in ids])
+
+    @property
+    def tokens(self) -> List[str]:
+        return self.vocab.decode(self.token_ids)
+
+    @property
+    def roman_tokens(self) -> List[str]:
+        return self.vocab.decode(self.roman_ids)
+
+    @_lazy
+    def markers(self) -> int:
+        return MARKERS.scan(self.lower)
+
+    @_lazy
+    def normalized_markers(self) -> int:
+        return MARKERS.scan(self.normalized)
+
+    @_lazy
+    def size(self) -> Optional[Tuple[float, str]]:
+        return _size(self.lower)
+
+    @_lazy
+    def normalized_size(self) -> Optional[Tuple[float, str]]:
+        return _size(self.normalized)
+
+    @_lazy
+    def year(self) -> bool:
+        return bool(MOVIE_YEAR_PATTERN.search(self.lower))
+
+    @_lazy
+    def normalized_year(self) -> bool:
+        return bool(YEAR_PATTERN.search(self.normalized))
+
+    @_lazy
+    def version(self) -> Optional[str]:
+        m = VERSION_PATTERN.search(self.lower)
+        return m.group(1) if m else None
+
+
+class TitleCache:
+    # Titles are interned into the cache's own vocabulary. Evicting a title
+    # does not un-intern its tokens, so once the vocabulary passes max_tokens
+    # and the cache has turned over since the last reset, both start afresh.
+    # Titles handed out earlier keep the vocabulary they were parsed with.
+    def __init__(self, max_titles: int = 65536, max_tokens: int = 262144):
+        self.max_titles = max_titles
+        self.max_tokens = max_tokens
+        self.hits = 0
+        self.misses = 0
+        self.vocab_resets = 0
+        self.vocab = TokenVocabulary()
+        self._misses_since_reset = 0
+        self._titles: "OrderedDict[str, ParsedTitle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TitleCache":
+        cache_config = config.get('search', {}).get('title_cache', {})
+        return cls(cache_config.get('max_titles', 65536), cache_config.get('max_tokens', 262144))
+
+    def get(self, title: str) -> ParsedTitle:
+        with self._lock:
+            parsed = self._titles.get(title)
+            if parsed is None:
+                self.misses += 1
+                self._misses_since_reset += 1
+                if len(self.vocab) > self.max_tokens and self._misses_since_reset > self.max_titles:
+                    self.vocab = TokenVocabulary()
+                    self.vocab_resets += 1
+                    self._misses_since_reset = 1
+                    self._titles.clear()
+                parsed = self._titles[title] = ParsedTitle(title, self.vocab)
+                if len(self._titles) > self.max_titles:
+                    self._titles.popitem(last=False)
+            else:
+                self.hits += 1
+                self._titles.move_to_end(title)
+        return parsed
+
+    def get_many(self, titles: List[str]) -> List[ParsedTitle]:
+        return [self.get(t) for t in titles]
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.hits} hits, {self.misses} misses ({self.hit_rate():.0%} hit rate), {len(self)} titles held, "
+                f"{len(self.vocab)} tokens interned ({self.vocab_resets} vocabulary resets)")
@@ -1,90 +1,113 @@
 import re
-from .normalizer import QueryNormalizer
+from typing import List
+import numpy as np
+from .normalizer import QueryNormalizer, ROMAN_TO阿拉伯数字
 from .game_detector import GameDetector
+from .markers import TokenHaystack, encode_tokens, SCORE_MOVIE, SCORE_GROUP, SCORE_EDITION, SCORE_PLATFORM
+from .parsed import ParsedTitle, TitleCache, VERSION_PATTERN
+from .fuzzy import coverage, coverage_many
+from .vocab import TokenVocabulary, token_counts
+from .alignment import Alignment, LONG_TITLE_TOKENS
 
+YEAR_TOKEN = re.compile(r'(?:19|20)\d{2}')
+FUZZY_MATCH_SCORE = 50
 
-class ConfidenceScorer:
-    def __init__(self, normalizer: QueryNormalizer):
+
+class QueryMatcher:
+    def __init__(self, scorer: "ConfidenceScorer", query: str):
+        normalizer = scorer.normalizer
+        self.query = query
         self.normalizer = normalizer
-        self.detector = GameDetector()
+        self.detector = scorer.detector
+        self.titles = scorer.titles
+        self.query_tokens_raw = normalizer.tokenize(query)
+        self.query_tokens_rom = normalizer.tokenize_with_roman(query)
+        self.phrase_pattern = re.compile(r'\b' + re.escape(' '.join(self.query_tokens_rom)) + r'\b')
+        self.expansions = [
+            (normalizer.tokenize_with_roman(expansion), normalizer.tokenize(expansion))
+            for expansion in normalizer.expand(query)
+        ]
+        self._encoded = self.encode(self.titles.vocab)
+        version = VERSION_PATTERN.search(query.lower())
+        self.version = version.group(1) if version else None
 
-    def score(self, query: str, filename: str) -> int:
-        query_tokens_raw = self.normalizer.tokenize(query)
-        filename_tokens_raw = self.normalizer.tokenize(filename)
-        filename_lower = self.normalizer.normalize(filename)
+    def encode(self, vocab: TokenVocabulary) -> tuple:
+        # The query as ids of one vocabulary: (vocab, query ids, their counts,
+        # per-expansion counts, every id worth indexing in a title).
+        query_ids = vocab.encode(self.query_tokens_rom)
+        # Roman mapping is per token, so both forms of an expansion have
+        # the same length.
+        expansion_counts = [
+            (token_counts(vocab.encode(rom)), token_counts(vocab.encode(raw)), len(rom))
+            for rom, raw in self.expansions
+        ]
+        wanted = set(query_ids)
+        for rom_counts, raw_counts, _ in expansion_counts:
+            wanted.update(rom_counts, raw_counts)
+        return vocab, query_ids, token_counts(query_ids), expansion_counts, wanted
 
+    def encoded(self, vocab: TokenVocabulary) -> tuple:
+        # Titles parsed before the cache reset its vocabulary still carry
+        # the old one.
+        encoded = self._encoded
+        if encoded[0] is not vocab:
+            encoded = self._encoded = self.encode(vocab)
+        return encoded
+
+    def score(self, filename: str) -> int:
+        query_tokens_raw = self.query_tokens_raw
         if not query_tokens_raw:
             return 0
+        return self._score_parsed(self.titles.get(filename))
+
+    def _score_parsed(self, parsed: ParsedTitle) -> int:
+        query_tokens_raw = self.query_tokens_raw
+        filename_lower = parsed.normalized
 
-        if self.detector.is_definitely_not_game(filename):
+        if self.detector.classify_not_game(parsed):
             return 0
 
-        query_tokens_rom = self.normalizer.tokenize_with_roman(query)
-        filename_tokens_rom = self.normalizer.tokenize_with_roman(filename)
+        query_tokens_rom = self.query_tokens_rom
+        _, query_ids, query_counts, expansion_counts, wanted = self.encoded(parsed.vocab)
+        ids = parsed.roman_ids
+        alignment = Alignment(ids, wanted)
 
-        direct_matched = 0
-        direct_positions = []
-        for qt in query_tokens_rom:
-            best_pos = -1
-            for i, ft in enumerate(filename_tokens_rom):
-                if i in direct_positions:
-                    continue
-                if qt == ft:
-                    best_pos = i
-                    break
-            if best_pos >= 0:
-                direct_matched += 1
-                direct_positions.append(best_pos)
+        direct_matched = alignment.matched(query_counts)
 
         if direct_matched == 0:
-            query_as_phrase = ' '.join(query_tokens_rom)
-            phrase_positions = self._find_phrase(filename_lower, query_as_phrase)
-            if phrase_positions is not None:
+            if self.phrase_pattern.search(filename_lower):
                 direct_matched = len(query_tokens_raw)
 
         expansion_matched = False
         expansion_match_count = 0
-        query_expansions = self.normalizer.expand(query)
-        for expansion in query_expansions:
-            expansion_tokens_rom = self.normalizer.tokenize_with_roman(expansion)
-            expansion_tokens_raw = self.normalizer.tokenize(expansion)
-
-            exp_positions_rom = []
-            exp_matched_rom = 0
-            for et in expansion_tokens_rom:
-                for i, ft in enumerate(filename_tokens_rom):
-                    if i not in exp_positions_rom and et == ft:
-                        exp_positions_rom.append(i)
-                        exp_matched_rom += 1
-                        break
-            if exp_matched_rom == len(expansion_tokens_rom) and exp_matched_rom > 0:
-                expansion_matched = True
-                expansion_match_count = exp_matched_rom
-                break
-
-            exp_positions_raw = []
-            exp_matched_raw = 0
-            for et in expansion_tokens_raw:
-                for i, ft in enumerate(filename_tokens_raw):
-                    if i not in exp_positions_raw and et == ft:
-                        exp_positions_raw.append(i)
-                        exp_matched_raw += 1
-                        break
-            if exp_matched_raw == len(expansion_tokens_raw) and exp_matched_raw > 0:
-                expansion_matched = True
-                expansion_match_count = exp_matched_raw
-                break
-
-        if direct_matched == 0 and not expansion_matched:
-            return 0
+        raw_alignment = alignment if parsed.token_ids is ids else None
+        for rom_counts, raw_counts, expansion_length in expansion_counts:
+            if not expansion_length:
+                continue
+            if not alignment.contains(rom_counts):
+                if raw_alignment is None:
+                    raw_alignment = Alignment(parsed.token_ids, wanted)
+                if not raw_alignment.contains(raw_counts):
+                    continue
+            expansion_matched = True
+            expansion_match_count = expansion_length
+            break
 
         effective_match = max(direct_matched, expansion_match_count)
         total_tokens = len(query_tokens_raw)
         all_tokens_matched = effective_match >= total_tokens
+        fuzzy_matched = not all_tokens_matched and coverage(query_tokens_rom, parsed.roman_tokens) >= total_tokens
+        tokens_covered = all_tokens_matched or fuzzy_matched
+
+        if direct_matched == 0 and not expansion_matched and not fuzzy_matched:
+            return 0
+
         token_ratio = effective_match / total_tokens
 
         if all_tokens_matched:
             score = 65
+        elif fuzzy_matched:
+            score = FUZZY_MATCH_SCORE
         elif token_ratio >= 0.5:
             score = 40
         else:
@@ -96,68 +119,170 @@ class ConfidenceScorer:
         if expansion_matched:
             score += 15
 
-        ordered_match = True
-        last_pos = -1
-        for qt in query_tokens_rom:
-            found = False
-            for i, ft in enumerate(filename_tokens_rom):
-                if i > last_pos and qt == ft:
-                    last_pos = i
-                    found = True
-                    break
-            if not found:
-                ordered_match = False
-                break
-        if ordered_match:
+        if alignment.ordered(query_ids):
             score += 10
 
-        extra_words = len(filename_tokens_raw) - effective_match
-        if extra_words > 0 and not all_tokens_matched:
+        extra_words = len(parsed.token_ids) - effective_match
+        if extra_words > 0 and not tokens_covered:
             penalty = min(extra_words * 3, 20)
             score -= penalty
 
-        movie_count = sum(1 for s in ['1080p','720p','2160p','web-dl','bluray','x264','x265','h264','h265','dvdrip','webrip','bdrip','brrip','hevc','remux','xvid','hdtv'] if s in filename_lower)
-        if movie_count >= 1:
+        hits = parsed.normalized_markers
+        if hits & SCORE_MOVIE:
             score -= 50
 
-        year_match = re.search(r'[\.\s\[\(]((?:19|20)\d{2})[\.\s\]\)]', filename_lower)
-        if year_match:
+        if parsed.normalized_year:
             score -= 40
 
-        if all_tokens_matched:
-            has_game_group = any(g in filename_lower for g in ['fitgirl','dodi','tenoke','reloaded','kaos','empress','elamigos','razor1911','codex','cpy','skidrow','plaza','corepack','rune','mercs','rgmechanics','mechanics','chronos'])
-            if has_game_group:
+        if tokens_covered:
+            if hits & SCORE_GROUP:
                 score += 15
 
-            has_edition = any(e in filename_lower for e in ['goty','deluxe','ultimate','dlc','complete','premium','definitive','enhanced','collection','anthology','digital deluxe'])
-            if has_edition:
+            if hits & SCORE_EDITION:
                 score += 5
 
-            has_platform = any(p in filename_lower for p in ['pc game','pc dvd','pc iso','steam','gog','epic','origin','windows','game','repack','steamrip'])
-            if has_platform:
+            if hits & SCORE_PLATFORM:
                 score += 5
 
-            size_match = re.search(r'(\d+\.?\d*)\s*(gb|mb|tb)', filename_lower)
-            if size_match:
-                size_val = float(size_match.group(1))
-                size_unit = size_match.group(2)
+            if parsed.normalized_size:
+                size_val, size_unit = parsed.normalized_size
                 if size_unit == 'gb' and size_val >= 1.0:
                     score += 5
 
-        version_match_q = re.search(r'v(\d+\.\d+)', query.lower())
-        version_match_f = re.search(r'v(\d+\.\d+)', filename.lower())
-        if version_match_q and version_match_f:
-            if version_match_q.group(1) != version_match_f.group(1):
+        if self.version is not None:
+            if parsed.version is not None and self.version != parsed.version:
                 score -= 20
 
-        if all_tokens_matched and self.detector.is_game(filename):
+        if tokens_covered and self.detector.classify_game(parsed):
             score += 10
 
         return max(0, min(100, score))
 
-    def _find_phrase(self, text: str, phrase: str) -> tuple:
-        pattern = re.compile(r'\b' + re.escape(phrase) + r'\b')
-        m = pattern.search(text)
-        if m:
-            return (m.start(), m.end())
-        return None
+    def score_many(self, titles: List[str], chunk_size: int = 65536) -> np.ndarray:
+        scores = np.zeros(len(titles), dtype=np.int64)
+        if not self.query_tokens_raw:
+            return scores
+        for start in range(0, len(titles), chunk_size):
+            scores[start:start + chunk_size] = self._score_chunk(titles[start:start + chunk_size])
+        return scores
+
+    def _score_chunk(self, titles: List[str]) -> np.ndarray:
+        # Same rules as score(), one column per title token. Normalized titles
+        # contain only word characters and single spaces, so tokenize() never
+        # drops a version token, tokenize_with_roman() is a per-token mapping
+        # and the year pattern is a whole interior token. The phrase fallback
+        # can only hit when a direct token already matched, so it is skipped.
+        parsed = self.titles.get_many(titles)
+        long_titles = [i for i, p in enumerate(parsed) if p.normalized.count(' ') >= LONG_TITLE_TOKENS]
+        if not long_titles:
+            return self._score_parsed_many(parsed)
+        # One long title would widen the token matrix of the whole chunk, so
+        # those are aligned one at a time instead.
+        scores = np.zeros(len(parsed), dtype=np.int64)
+        scores[long_titles] = [self._score_parsed(parsed[i]) for i in long_titles]
+        short = np.setdiff1d(np.arange(len(parsed)), long_titles)
+        if len(short):
+            scores[short] = self._score_parsed_many([parsed[i] for i in short])
+        return scores
+
+    def _score_parsed_many(self, parsed: List[ParsedTitle]) -> np.ndarray:
+        normalized = [p.normalized for p in parsed]
+        raw, lengths, vocab = encode_tokens(normalized)
+        n = len(parsed)
+        columns = np.arange(raw.shape[1])
+
+        tokens = list(vocab)
+        haystack = TokenHaystack(normalized, raw, tokens)
+        year_token = np.array([bool(YEAR_TOKEN.fullmatch(t)) for t in tokens] + [False], dtype=bool)
+        roman = np.array([vocab.setdefault(ROMAN_TO阿拉伯数字.get(t, t), len(vocab)) for t in tokens] + [-1],
+                         dtype=np.int32)
+        rom = roman[raw]
+
+        counts = {}
+        def count(matrix, token):
+            key = (matrix is rom, token)
+            if key not in counts:
+                tid = vocab.get(token)
+                counts[key] = (matrix == tid).sum(1) if tid is not None else np.zeros(n, dtype=np.int64)
+            return counts[key]
+
+        def contained(matrix, needed):
+            if not needed:
+                return np.zeros(n, dtype=bool)
+            ok = np.ones(n, dtype=bool)
+            for token in set(needed):
+                ok &= count(matrix, token) >= needed.count(token)
+            return ok
+
+        direct = np.zeros(n, dtype=np.int64)
+        for token in set(self.query_tokens_rom):
+            direct += np.minimum(count(rom, token), self.query_tokens_rom.count(token))
+
+        expansion_matched = np.zeros(n, dtype=bool)
+        expansion_count = np.zeros(n, dtype=np.int64)
+        for expansion_tokens_rom, expansion_tokens_raw in reversed(self.expansions):
+            matched = contained(rom, expansion_tokens_rom) | contained(raw, expansion_tokens_raw)
+            expansion_count = np.where(matched, len(expansion_tokens_rom), expansion_count)
+            expansion_matched |= matched
+
+        total = len(self.query_tokens_raw)
+        effective = np.maximum(direct, expansion_count)
+        all_matched = effective >= total
+        fuzzy = np.zeros(n, dtype=bool)
+        partial = np.flatnonzero(~all_matched)
+        fuzzy[partial] = coverage_many(self.query_tokens_rom, rom, vocab, partial) >= total
+        covered = all_matched | fuzzy
+        score = np.where(all_matched, 65, np.where(fuzzy, FUZZY_MATCH_SCORE, np.where(effective * 2 >= total, 40, 0)))
+        alive = (score > 0) & ((direct > 0) | expansion_matched | fuzzy)
+        alive &= ~self.detector.classify_not_game_many(parsed)
+
+        ordered = np.ones(n, dtype=bool)
+        last = np.full(n, -1)
+        for token in self.query_tokens_rom:
+            tid = vocab.get(token)
+            hits = (rom == tid) & (columns > last[:, None]) if tid is not None else np.zeros(rom.shape, dtype=bool)
+            found = hits.any(1)
+            last = np.where(found, hits.argmax(1), last)
+            ordered &= found
+
+        score += 15 * expansion_matched + 10 * ordered
+        extra = lengths - effective
+        score -= np.where((extra > 0) & ~covered, np.minimum(extra * 3, 20), 0)
+
+        score -= 50 * haystack.contains(SCORE_MOVIE)
+        interior = (columns > 0) & (columns < lengths[:, None] - 1)
+        score -= 40 * (year_token[raw] & interior).any(1)
+
+        bonus = np.flatnonzero(alive & covered)
+        if len(bonus):
+            score[bonus] += (15 * haystack.contains(SCORE_GROUP) + 5 * haystack.contains(SCORE_EDITION)
+                             + 5 * haystack.contains(SCORE_PLATFORM))[bonus]
+            for i in bonus[haystack.contains_any(['gb'])[bonus]]:
+                size = parsed[i].normalized_size
+                if size and size[1] == 'gb' and size[0] >= 1.0:
+                    score[i] += 5
+            score[bonus] += 10 * self.detector.classify_game_many([parsed[i] for i in bonus])
+
+        if self.version is not None:
+            for i in np.flatnonzero(alive):
+                if parsed[i].version is not None and self.version != parsed[i].version:
+                    score[i] -= 20
+
+        return np.where(alive, np.clip(score, 0, 100), 0)
+
+
+
+class ConfidenceScorer:
+    def __init__(self, normalizer: QueryNormalizer, titles: TitleCache = None):
+        self.normalizer = normalizer
+        self.titles = titles if titles is not None else TitleCache()
+        self.detector = GameDetector(self.titles)
+
+    def compile(self, query: str) -> QueryMatcher:
+        return QueryMatcher(self, query)
+
+    def score(self, query: str, filename: str) -> int:
+        return self.compile(query).score(filename)
+
+    def score_many(self, query: str, titles: List[str]) -> np.ndarray:
+        return self.compile(query).score_many(titles)
@@ -0,0 +1,45 @@
+# matching/vocab.py
+import threading
+from array import array
+from typing import Dict, Iterable, List
+from .normalizer import ROMAN_TO阿拉伯数字
+
+
+class TokenVocabulary:
+    # Interns tokens to small integer ids shared by every parsed title and
+    # compiled query, so matching compares ints instead of strings. Roman
+    # numerals are interned first, with the ids of the digits they map to.
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._tokens: List[str] = []
+        self._lock = threading.Lock()
+        self.roman: Dict[int, int] = {self.intern(k): self.intern(v) for k, v in ROMAN_TO阿拉伯数字.items()}
+
+    def intern(self, token: str) -> int:
+        token_id = self._ids.get(token)
+        if token_id is None:
+            with self._lock:
+                token_id = self._ids.get(token)
+                if token_id is None:
+                    self._tokens.append(token)
+                    token_id = self._ids[token] = len(self._tokens) - 1
+        return token_id
+
+    def encode(self, tokens: Iterable[str]) -> array:
+        return array('i', map(self.intern, tokens))
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        return [self._tokens[i] for i in ids]
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+VOCAB = TokenVocabulary()
+
+
+def token_counts(ids: Iterable[int]) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for token_id in ids:
+        counts[token_id] = counts.get(token_id, 0) + 1
+    return counts
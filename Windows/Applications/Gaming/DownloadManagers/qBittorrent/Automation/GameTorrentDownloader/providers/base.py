@@ -1,5 +1,15 @@
+import asyncio
+import re
+import threading
+import time
+import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+from .transport import HttpTransport
+from .ratelimit import RateLimited
 
 @dataclass
 class SearchResult:
@@ -10,20 +20,393 @@ class SearchResult:
     size_gb: float
     source: str
     info_hash: str
+    resolver: Optional[Callable[[], str]] = field(default=None, repr=False, compare=False)
+    unresolvable: bool = field(default=False, init=False, repr=False, compare=False)
+    _resolve_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
 
     @property
     def is_magnet(self) -> bool:
         return self.url.startswith('magnet:')
 
+    @property
+    def is_pending(self) -> bool:
+        return self.resolver is not None
+
+    def resolve(self) -> bool:
+        # Every term that joined the same search ranks the same objects, so
+        # the lookup runs once under a lock and a failure stays a failure.
+        with self._resolve_lock:
+            if self.resolver is not None:
+                resolver, self.resolver = self.resolver, None
+                try:
+                    url = resolver()
+                except Exception:
+                    url = ""
+                if url:
+                    self.url = url
+                    if not self.info_hash:
+                        self.info_hash = info_hash_from_magnet(url)
+                else:
+                    self.unresolvable = True
+            return not self.unresolvable
+
+def info_hash_from_magnet(magnet: str) -> str:
+    m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
+    return m.group(1).lower() if m else ""
+
+UNKNOWN = "unknown"
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+@dataclass
+class ProviderHealth:
+    state: str = UNKNOWN
+    consecutive_failures: int = 0
+    successes: int = 0
+    failures: int = 0
+    partials: int = 0
+    throttled: int = 0
+    opened_at: float = 0.0
+    trial_in_flight: bool = False
+    latencies: deque = field(default_factory=lambda: deque(maxlen=50))
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def latency_p50(self) -> Optional[float]:
+        return self.latency_quantile(0.5)
+
+class HealthRegistry:
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config: dict):
+        breaker = config.get('search', {}).get('circuit_breaker', {})
+        self.failure_threshold = breaker.get('failure_threshold', self.failure_threshold)
+        self.reset_timeout = breaker.get('reset_timeout', self.reset_timeout)
+
+    def reset(self):
+        with self._lock:
+            self._providers.clear()
+
+    def _get(self, name: str) -> ProviderHealth:
+        if name not in self._providers:
+            self._providers[name] = ProviderHealth()
+        return self._providers[name]
+
+    def state(self, name: str) -> str:
+        with self._lock:
+            h = self._get(name)
+            if h.state == OPEN and time.monotonic() - h.opened_at >= self.reset_timeout:
+                h.state = HALF_OPEN
+                h.trial_in_flight = False
+            return h.state
+
+    def allow(self, name: str) -> bool:
+        state = self.state(name)
+        if state == OPEN:
+            return False
+        if state == HALF_OPEN:
+            with self._lock:
+                h = self._get(name)
+                if h.trial_in_flight:
+                    return False
+                h.trial_in_flight = True
+        return True
+
+    def release(self, name: str):
+        # Hands back a half-open trial that ended without a success or a
+        # failure being recorded, so the next request can take it.
+        with self._lock:
+            h = self._get(name)
+            if h.state == HALF_OPEN:
+                h.trial_in_flight = False
+
+    def record_success(self, name: str, latency: float = None):
+        with self._lock:
+            h = self._get(name)
+            h.state = CLOSED
+            h.consecutive_failures = 0
+            h.successes += 1
+            h.trial_in_flight = False
+            if latency is not None:
+                h.latencies.append(latency)
+
+    def record_failure(self, name: str, fatal: bool = False):
+        with self._lock:
+            h = self._get(name)
+            h.consecutive_failures += 1
+            h.failures += 1
+            h.trial_in_flight = False
+            if fatal or h.state == HALF_OPEN or h.consecutive_failures >= self.failure_threshold:
+                h.state = OPEN
+                h.opened_at = time.monotonic()
+
+    def record_partial(self, name: str):
+        # A search cut short by its deadline; the results it did return are
+        # real but incomplete.
+        with self._lock:
+            self._get(name).partials += 1
+
+    def partial_count(self, name: str) -> int:
+        with self._lock:
+            return self._get(name).partials
+
+    def record_throttled(self, name: str):
+        # The host turned a request away (429, or no rate-limit slot before
+        # the deadline). Says nothing about its health, so a half-open trial
+        # is handed back rather than decided.
+        with self._lock:
+            h = self._get(name)
+            h.throttled += 1
+            if h.state == HALF_OPEN:
+                h.trial_in_flight = False
+
+    def throttled_count(self, name: str) -> int:
+        with self._lock:
+            return self._get(name).throttled
+
+    def latency(self, name: str, q: float = 0.5) -> Optional[float]:
+        with self._lock:
+            return self._get(name).latency_quantile(q)
+
+    def failure_count(self, name: str) -> int:
+        with self._lock:
+            return self._get(name).failures
+
+    def summary(self) -> Dict[str, ProviderHealth]:
+        with self._lock:
+            return dict(self._providers)
+
+health = HealthRegistry()
+
 class SearchProvider:
     name: str = "base"
+    rate_limited: bool = False
+    health: HealthRegistry = health
+    transport: Optional[HttpTransport] = None
+    _transport_lock = threading.Lock()
+    _hedge_pool: Optional[ThreadPoolExecutor] = None
+    _page_pool: Optional[ThreadPoolExecutor] = None
+    scorer = None
 
     def __init__(self, config: dict):
         self.config = config
-        self.timeout = config.get('search', {}).get('timeout_per_source', 15)
+        search_config = config.get('search', {})
+        self.timeout = search_config.get('timeout_per_source', 15)
+        self.max_results = search_config.get('max_results_per_source', 100)
+        self.confidence_threshold = search_config.get('confidence_threshold', 50)
+        pagination = search_config.get('pagination', {})
+        self.max_pages = pagination.get('max_pages', 5)
+        self.page_concurrency = pagination.get('page_concurrency', 2)
+        hedge_config = search_config.get('hedge', {})
+        self.hedge_delay = hedge_config.get('delay', 1.0)
+        self.hedge_min_delay = hedge_config.get('min_delay', 0.05)
+        self.hedge_quantile = hedge_config.get('quantile', 0.9)
+        with SearchProvider._transport_lock:
+            if SearchProvider.transport is None:
+                SearchProvider.transport = HttpTransport.from_config(config)
+            if SearchProvider._hedge_pool is None:
+                SearchProvider._hedge_pool = ThreadPoolExecutor(
+                    max_workers=hedge_config.get('max_workers', 8), thread_name_prefix="hedge")
+            if SearchProvider._page_pool is None:
+                SearchProvider._page_pool = ThreadPoolExecutor(
+                    max_workers=pagination.get('max_workers', 8), thread_name_prefix="page")
+
+    def _mirror_key(self, url: str) -> str:
+        return f"{self.name}/{urlsplit(url).netloc}"
+
+    def _rank_mirrors(self, urls: List[str]) -> List[str]:
+        live = [u for u in urls if self.health.state(self._mirror_key(u)) != OPEN]
+        def speed(item):
+            index, url = item
+            p50 = self.health.latency(self._mirror_key(url))
+            return (p50 is None, p50 or 0.0, index)
+        return [url for _, url in sorted(enumerate(live), key=speed)]
+
+    def _hedge_after(self, url: str) -> float:
+        latency = self.health.latency(self._mirror_key(url), self.hedge_quantile)
+        return max(self.hedge_min_delay, latency if latency is not None else self.hedge_delay)
+
+    def _get_hedged(self, urls: List[str], parse: Callable[[requests.Response], Any], **kwargs) -> Any:
+        # Mirrors record health under their own keys; the outcome of the
+        # whole fan-out is recorded under the provider, so its breaker and
+        # the result cache see an outage of every mirror.
+        order = self._rank_mirrors(urls)
+        if not order:
+            print(f"  {self.name}: every mirror's circuit is open, skipping")
+            self.health.record_failure(self.name)
+            return None
+        timeout = kwargs.get('timeout', self.timeout)
+        deadline = time.monotonic() + timeout
+
+        def attempt(url):
+            r = self._get(url, health_key=self._mirror_key(url), **kwargs)
+            if r.status_code >= 500:
+                raise requests.exceptions.HTTPError(f"HTTP {r.status_code}", response=r)
+            return parse(r)
+
+        pending = {}
+        launched = 0
+        answered = False
+        try:
+            while True:
+                if launched < len(order) and (not pending or launched == 0):
+                    pending[self._hedge_pool.submit(attempt, order[launched])] = order[launched]
+                    launched += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not pending:
+                    break
+                hedge = self._hedge_after(order[launched - 1]) if launched < len(order) else remaining
+                done, _ = wait(pending, timeout=min(hedge, remaining), return_when=FIRST_COMPLETED)
+                if not done:
+                    if launched < len(order):
+                        pending[self._hedge_pool.submit(attempt, order[launched])] = order[launched]
+                        launched += 1
+                    continue
+                for future in done:
+                    url = pending.pop(future)
+                    try:
+                        parsed = future.result()
+                    except Exception as e:
+                        print(f"  {self.name} mirror error ({url}): {e}")
+                        continue
+                    answered = True
+                    if parsed:
+                        self.health.record_success(self.name)
+                        return parsed
+        finally:
+            # Requests already on the wire finish in the background and are
+            # dropped; only queued attempts can actually be cancelled.
+            for future in pending:
+                future.cancel()
+        if answered:
+            self.health.record_success(self.name)
+        else:
+            self.health.record_failure(self.name)
+        return None
+
+    def split_query(self, query: str) -> List[str]:
+        return [query]
+
+    def _page_relevant(self, query: str, items: list, title: Callable[[Any], str]) -> bool:
+        matchers = [self.scorer.compile(q) for q in self.split_query(query)]
+        return any(m.score(title(item)) >= self.confidence_threshold
+                   for item in items for m in matchers)
+
+    def _paginate(self, query: str, fetch_page: Callable[[int], list], deadline: float,
+                  title: Callable[[Any], str] = lambda r: r.title) -> list:
+        items = list(fetch_page(1))
+        if self.scorer is None or not items or not self._page_relevant(query, items, title):
+            return items[:self.max_results]
+        page = 2
+        while page <= self.max_pages and len(items) < self.max_results:
+            pages = range(page, min(self.max_pages, page + self.page_concurrency - 1) + 1)
+            futures = [self._page_pool.submit(fetch_page, n) for n in pages]
+            relevant = True
+            try:
+                for future in futures:
+                    rows = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    items.extend(rows)
+                    if not rows or not self._page_relevant(query, rows, title):
+                        relevant = False
+                        break
+            except FuturesTimeout:
+                print(f"  {self.name}: deadline reached, stopping at page {page}")
+                self.health.record_partial(self.name)
+                relevant = False
+            except Exception as e:
+                print(f"  {self.name} page error: {e}")
+                relevant = False
+            finally:
+                for future in futures:
+                    future.cancel()
+            if not relevant:
+                break
+            page = pages[-1] + 1
+        return items[:self.max_results]
+
+    def _get(self, url: str, health_key: str = None, **kwargs) -> requests.Response:
+        key = health_key or self.name
+        start = time.monotonic()
+        try:
+            r = self.transport.get(url, limited=self.rate_limited, **kwargs)
+        except RateLimited:
+            self._throttled(key)
+            raise
+        except Exception:
+            self.health.record_failure(key)
+            raise
+        if r.status_code >= 500:
+            self.health.record_failure(key)
+        elif r.status_code == 429:
+            self._throttled(key)
+        else:
+            self.health.record_success(key, time.monotonic() - start)
+        return r
+
+    def _throttled(self, key: str):
+        # Always counted under the provider as well: whatever the search
+        # returns without this request is incomplete and must not be cached.
+        self.health.record_throttled(key)
+        if key != self.name:
+            self.health.record_throttled(self.name)
+
+    def iter_search(self, query: str) -> Iterator[List[SearchResult]]:
+        yield self.search(query)
 
     def search(self, query: str) -> List[SearchResult]:
         raise NotImplementedError
 
+    def merge_queries(self, queries: List[str]) -> Optional[str]:
+        return None
+
+    def restore(self, result: SearchResult) -> SearchResult:
+        return result
+
+    async def iter_search_async(self, query: str) -> AsyncIterator[List[SearchResult]]:
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                stop.set()
+
+        def pump():
+            batches = self.iter_search(query)
+            try:
+                for batch in batches:
+                    put(batch)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                put(e)
+            finally:
+                batches.close()
+                put(done)
+
+        loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
     def is_available(self) -> bool:
         raise NotImplementedError
@@ -0,0 +1,37 @@
+# providers/extract.py
+import re
+from typing import Optional
+from lxml import etree, html
+
+PARSER = html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True)
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w-]+)', re.I)
+
+def has_class(cls: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+def xpath(expr: str) -> etree.XPath:
+    return etree.XPath(expr)
+
+def response_encoding(r) -> str:
+    m = CHARSET_PATTERN.search(r.headers.get('content-type', '') or '')
+    return m.group(1) if m else 'utf-8'
+
+def slice_block(content: bytes, start: re.Pattern, end: Optional[bytes] = None) -> bytes:
+    m = start.search(content)
+    if not m:
+        return content
+    if end is None:
+        return content[m.start():]
+    stop = content.find(end, m.end())
+    return content[m.start():stop + len(end) if stop >= 0 else len(content)]
+
+def parse(fragment: bytes, encoding: str = 'utf-8') -> html.HtmlElement:
+    parser = PARSER if encoding.lower() in ('utf-8', 'utf8') else html.HTMLParser(
+        encoding=encoding, remove_comments=True, remove_pis=True)
+    try:
+        return html.fromstring(fragment, parser=parser)
+    except etree.ParserError:
+        return html.Element('html')
+
+def text(el) -> str:
+    return ''.join(s.strip() for s in el.itertext())
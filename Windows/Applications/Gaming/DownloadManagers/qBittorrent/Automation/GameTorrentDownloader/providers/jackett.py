@@ -1,6 +1,13 @@
-import requests
-from typing import List
-from .base import SearchProvider, SearchResult
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import Iterator, List, Optional
+from lxml import etree
+from .base import SearchProvider, SearchResult, OPEN
+
+PC_CATEGORIES = [4000, 4050]
+TORZNAB_PATH = "/api/v2.0/indexers/all/results/torznab/api"
 
 class JackettProvider(SearchProvider):
     name = "jackett"
@@ -11,41 +18,119 @@ class JackettProvider(SearchProvider):
         self.base_url = jackett_config.get('url', 'http://127.0.0.1:9117')
         self.api_key = jackett_config.get('api_key', '')
         self.auto_discover = jackett_config.get('auto_discover', True)
+        self.indexer_timeout = min(jackett_config.get('indexer_timeout', 10), self.timeout)
+        self.min_seeders = jackett_config.get('min_seeders', 0)
+        self.indexers: Optional[List[str]] = None
+        self._discover_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=jackett_config.get('max_parallel_indexers', 8),
+                                        thread_name_prefix="jackett-indexer")
+
+    def _params(self, **params) -> dict:
+        if self.api_key:
+            params["apikey"] = self.api_key
+        return params
 
     def is_available(self) -> bool:
+        # Jackett answers the indexer listing itself; a results query would
+        # wait on the slowest tracker behind it.
         try:
-            url = f"{self.base_url}/api/v2.0/indexers/all/results"
-            params = {"q": "test", "Category[]": 4000}
-            if self.api_key:
-                params["api_key"] = self.api_key
-            r = requests.get(url, params=params, timeout=5)
+            r = self._get(f"{self.base_url}{TORZNAB_PATH}", params=self._params(t="indexers", configured="true"),
+                          timeout=5)
             return r.status_code == 200
         except:
             return False
 
+    def discover_indexers(self) -> List[str]:
+        with self._discover_lock:
+            if self.indexers is not None:
+                return self.indexers
+            indexers = []
+            try:
+                r = self._get(f"{self.base_url}{TORZNAB_PATH}", params=self._params(t="indexers", configured="true"),
+                              timeout=5)
+                if r.status_code == 200:
+                    indexers = self._parse_indexers(r.content)
+            except Exception as e:
+                print(f"  Jackett indexer discovery failed: {e}")
+            self.indexers = indexers
+            return indexers
+
+    def _parse_indexers(self, content: bytes) -> List[str]:
+        root = etree.fromstring(content)
+        indexers = []
+        for indexer in root.iter('indexer'):
+            if indexer.get('configured', 'true') != 'true':
+                continue
+            categories = [c.get('id', '') for c in indexer.iter('category')]
+            if categories and not any(c.startswith('40') for c in categories):
+                continue
+            indexers.append(indexer.get('id'))
+        return indexers
+
+    def iter_search(self, query: str) -> Iterator[List[SearchResult]]:
+        indexers = self.discover_indexers() if self.auto_discover else []
+        if not indexers:
+            yield self._search_indexer("all", query) or []
+            return
+        # Indexers record health under their own keys; the outcome of the
+        # whole fan-out is recorded under the provider, so its breaker and
+        # the result cache see Jackett itself being down.
+        deadline = time.monotonic() + self.timeout
+        active = [i for i in indexers if self.health.state(f"{self.name}/{i}") != OPEN]
+        futures = {self._pool.submit(self._search_indexer, i, query): i for i in active}
+        answered = False
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                results = future.result()
+                if results is not None:
+                    answered = True
+                    yield results
+        except FuturesTimeout:
+            slow = [futures[f] for f in futures if not f.done()]
+            print(f"  Jackett: deadline reached, skipping slow indexers: {', '.join(slow)}")
+            self.health.record_partial(self.name)
+        finally:
+            for future in futures:
+                future.cancel()
+        if not active:
+            print("  Jackett: every indexer's circuit is open, skipping")
+        if answered:
+            self.health.record_success(self.name)
+        else:
+            self.health.record_failure(self.name)
+
     def search(self, query: str) -> List[SearchResult]:
+        results = []
+        for batch in self.iter_search(query):
+            results.extend(batch)
+        return results
+
+    def _search_indexer(self, indexer: str, query: str) -> Optional[List[SearchResult]]:
+        # None when the indexer did not answer.
         results = []
         try:
-            url = f"{self.base_url}/api/v2.0/indexers/all/results"
-            params = {"q": query, "Category[]": 4000}
-            if self.api_key:
-                params["api_key"] = self.api_key
-            r = requests.get(url, params=params, timeout=self.timeout)
+            url = f"{self.base_url}/api/v2.0/indexers/{indexer}/results"
+            params = self._params(Query=query)
+            params["Category[]"] = PC_CATEGORIES
+            timeout = self.timeout if indexer == "all" else self.indexer_timeout
+            health_key = None if indexer == "all" else f"{self.name}/{indexer}"
+            r = self._get(url, health_key=health_key, params=params, timeout=timeout)
             if r.status_code != 200:
-                return results
+                return None
             data = r.json()
             for item in data.get('Results', []):
                 title = item.get('Title', '')
-                seeders = item.get('Seeders', 0)
-                leechers = item.get('Peers', 0) - seeders
-                size_bytes = item.get('Size', 0)
+                seeders = item.get('Seeders', 0) or 0
+                if seeders < self.min_seeders:
+                    continue
+                leechers = (item.get('Peers', 0) or 0) - seeders
+                size_bytes = item.get('Size', 0) or 0
                 size_gb = size_bytes / (1024**3)
-                magnet = item.get('MagnetUri', '')
-                link = item.get('Link', '')
+                magnet = item.get('MagnetUri', '') or ''
+                link = item.get('Link', '') or ''
                 url = magnet if magnet else link
-                info_hash = item.get('InfoHash', '')
+                info_hash = item.get('InfoHash', '') or ''
                 if not info_hash and magnet:
-                    import re
                     m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
                     if m:
                         info_hash = m.group(1).lower()
@@ -60,5 +145,6 @@ class JackettProvider(SearchProvider):
                         info_hash=info_hash
                     ))
         except Exception as e:
-            print(f"  Jackett error: {e}")
+            print(f"  Jackett error ({indexer}): {e}")
+            return None
         return results
@@ -1,16 +1,36 @@
 # providers/leetx.py
-import requests
-from bs4 import BeautifulSoup
-from typing import List
-from .base import SearchProvider, SearchResult
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+import re
+from typing import Dict, List
+from .base import SearchProvider, SearchResult, info_hash_from_magnet
+from .magnet_cache import MagnetCache
+from . import extract
+
+TABLE_START = re.compile(rb'<table[^>]*class="[^"]*\btable-list\b')
+TABLE = extract.xpath(f"//table[{extract.has_class('table-list')}]")
+TBODY = extract.xpath("(.//tbody)[1]")
+ROWS = extract.xpath(".//tr")
+CELLS = extract.xpath(".//td")
+NAME_LINK = extract.xpath(f".//a[{extract.has_class('name')}]")
+MAGNET_LINK = extract.xpath("//a[starts-with(@href, 'magnet:')]")
 
 class LeetxProvider(SearchProvider):
     name = "1337x"
+    rate_limited = True
     BASE_URL = "https://1337x.to"
 
+    def __init__(self, config: dict):
+        super().__init__(config)
+        detail_concurrency = config.get('search', {}).get('detail_concurrency', 8)
+        self.lazy_magnets = config.get('search', {}).get('lazy_magnets', True)
+        self._detail_pool = ThreadPoolExecutor(max_workers=detail_concurrency, thread_name_prefix="1337x-detail")
+        self.magnet_cache = MagnetCache.from_config(config, "1337x")
+
     def is_available(self) -> bool:
         try:
-            r = requests.get(self.BASE_URL, timeout=5, headers=self._headers())
+            r = self._get(self.BASE_URL, timeout=5, headers=self._headers())
             return r.status_code == 200
         except:
             return False
@@ -20,34 +40,17 @@ class LeetxProvider(SearchProvider):
 
     def search(self, query: str) -> List[SearchResult]:
         results = []
+        deadline = time.monotonic() + self.timeout
         try:
-            search_url = f"{self.BASE_URL}/search/{query}/1/"
-            r = requests.get(search_url, headers=self._headers(), timeout=self.timeout)
-            if r.status_code != 200:
-                return results
-            soup = BeautifulSoup(r.text, 'html.parser')
-            table = soup.find('table', class_='table-list')
-            if not table:
-                return results
-            rows = table.find('tbody').find_all('tr')[:30]
-            for row in rows:
-                cols = row.find_all('td')
-                if len(cols) < 7:
-                    continue
-                name_tag = cols[0].find('a', class_='name')
-                if not name_tag:
-                    continue
-                title = name_tag.get_text(strip=True)
-                detail_link = name_tag.get('href', '')
-                seeders = self._parse_int(cols[1].get_text(strip=True))
-                leechers = self._parse_int(cols[2].get_text(strip=True))
-                size_text = cols[4].get_text(strip=True)
-                size_gb = self._parse_size(size_text)
-                magnet = self._get_magnet(detail_link)
+            entries = self._paginate(query, lambda page: self._search_page(query, page, deadline),
+                                     deadline, title=lambda e: e[0])
+            if self.lazy_magnets:
+                magnets = {e[1]: self.magnet_cache.get(e[1]) for e in entries}
+            else:
+                magnets = self._resolve_magnets([e[1] for e in entries], deadline)
+            for title, detail_link, seeders, leechers, size_gb in entries:
+                magnet = magnets.get(detail_link)
                 if magnet:
-                    import re
-                    m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
-                    info_hash = m.group(1).lower() if m else ""
                     results.append(SearchResult(
                         title=title,
                         url=magnet,
@@ -55,22 +58,124 @@ class LeetxProvider(SearchProvider):
                         leechers=leechers,
                         size_gb=size_gb,
                         source="1337x",
-                        info_hash=info_hash
+                        info_hash=info_hash_from_magnet(magnet)
+                    ))
+                elif self.lazy_magnets:
+                    results.append(SearchResult(
+                        title=title,
+                        url=f"{self.BASE_URL}{detail_link}",
+                        seeders=seeders,
+                        leechers=leechers,
+                        size_gb=size_gb,
+                        source="1337x",
+                        info_hash="",
+                        resolver=partial(self._resolve_magnet, detail_link)
                     ))
         except Exception as e:
             print(f"  1337x error: {e}")
         return results
 
-    def _get_magnet(self, detail_path: str) -> str:
+    def _search_page(self, query: str, page: int, deadline: float) -> list:
+        timeout = self.timeout if page == 1 else max(0.1, deadline - time.monotonic())
+        r = self._get(f"{self.BASE_URL}/search/{query}/{page}/", headers=self._headers(), timeout=timeout)
+        if r.status_code != 200:
+            return []
+        return self._parse_rows(r.content, extract.response_encoding(r))
+
+    def _parse_rows(self, content: bytes, encoding: str = 'utf-8') -> list:
+        fragment = extract.slice_block(content, TABLE_START, b'</table>')
+        tables = TABLE(extract.parse(fragment, encoding))
+        if not tables:
+            return []
+        tbody = TBODY(tables[0])
+        if not tbody:
+            return []
+        entries = []
+        for row in ROWS(tbody[0]):
+            cols = CELLS(row)
+            if len(cols) < 7:
+                continue
+            name_tag = NAME_LINK(cols[0])
+            if not name_tag:
+                continue
+            title = extract.text(name_tag[0])
+            detail_link = name_tag[0].get('href', '')
+            seeders = self._parse_int(extract.text(cols[1]))
+            leechers = self._parse_int(extract.text(cols[2]))
+            size_gb = self._parse_size(extract.text(cols[4]))
+            entries.append((title, detail_link, seeders, leechers, size_gb))
+        return entries
+
+    def _resolve_magnets(self, detail_paths: List[str], deadline: float) -> Dict[str, str]:
+        resolved = {}
+        pending = []
+        for path in dict.fromkeys(detail_paths):
+            cached = self.magnet_cache.get(path)
+            if cached:
+                resolved[path] = cached
+            else:
+                pending.append(path)
+        if not pending:
+            return resolved
+        futures = {self._detail_pool.submit(self._get_magnet, path, deadline): path for path in pending}
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                magnet = future.result()
+                if magnet:
+                    path = futures[future]
+                    resolved[path] = magnet
+                    self.magnet_cache.put(path, magnet)
+        except FuturesTimeout:
+            unresolved = sum(1 for f in futures if not f.done())
+            print(f"  1337x: deadline reached, returning partial results ({unresolved} detail pages unresolved)")
+            self.health.record_partial(self.name)
+        finally:
+            for future in futures:
+                future.cancel()
+        return resolved
+
+    def restore(self, result: SearchResult) -> SearchResult:
+        if not result.is_magnet and result.url.startswith(self.BASE_URL):
+            detail_path = result.url[len(self.BASE_URL):]
+            magnet = self.magnet_cache.get(detail_path)
+            if magnet:
+                result.url = magnet
+                result.info_hash = info_hash_from_magnet(magnet)
+            else:
+                result.resolver = partial(self._resolve_magnet, detail_path)
+        return result
+
+    def _resolve_magnet(self, detail_path: str) -> str:
+        magnet = self._get_magnet(detail_path)
+        if magnet:
+            self.magnet_cache.put(detail_path, magnet)
+        return magnet
+
+    def _get_magnet(self, detail_path: str, deadline: float = None) -> str:
         try:
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return ""
             url = f"{self.BASE_URL}{detail_path}"
-            r = requests.get(url, headers=self._headers(), timeout=self.timeout)
-            soup = BeautifulSoup(r.text, 'html.parser')
-            magnet_link = soup.find('a', href=lambda x: x and x.startswith('magnet:'))
-            return magnet_link['href'] if magnet_link else ""
+            r = self._get(url, headers=self._headers(), timeout=timeout)
+            return self._parse_magnet(r.content, extract.response_encoding(r))
         except:
             return ""
 
+    def _parse_magnet(self, content: bytes, encoding: str = 'utf-8') -> str:
+        start = content.find(b'href="magnet:')
+        if start >= 0:
+            anchor = content.rfind(b'<a', 0, start)
+            end = content.find(b'</a>', start)
+            if anchor >= 0 and end >= 0:
+                links = MAGNET_LINK(extract.parse(content[anchor:end + 4], encoding))
+                if links:
+                    return links[0].get('href')
+        links = MAGNET_LINK(extract.parse(content, encoding))
+        return links[0].get('href') if links else ""
+
     def _parse_int(self, text: str) -> int:
         try:
             return int(text.replace(',', ''))
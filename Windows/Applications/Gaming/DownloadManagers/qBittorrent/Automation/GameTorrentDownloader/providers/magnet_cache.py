@@ -0,0 +1,53 @@
+# providers/magnet_cache.py
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache"
+
+def cache_dir(config: dict) -> Path:
+    configured = config.get('search', {}).get('cache_dir')
+    if not configured:
+        return DEFAULT_CACHE_DIR
+    path = Path(configured)
+    if not path.is_absolute():
+        path = Path(__file__).parent.parent / path
+    return path
+
+class MagnetCache:
+    def __init__(self, path):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS magnets ("
+            "detail_path TEXT PRIMARY KEY, magnet TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config: dict, name: str) -> "MagnetCache":
+        return cls(cache_dir(config) / f"{name}_magnets.sqlite3")
+
+    def get(self, detail_path: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT magnet FROM magnets WHERE detail_path = ?", (detail_path,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, detail_path: str, magnet: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO magnets (detail_path, magnet, fetched_at) VALUES (?, ?, ?)",
+                (detail_path, magnet, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,65 +1,95 @@
 # providers/nyaa.py
-import requests
-from bs4 import BeautifulSoup
+import re
+import time
 from typing import List
 from .base import SearchProvider, SearchResult
+from . import extract
+
+TABLE_START = re.compile(rb'<table[^>]*class="[^"]*\btable-hover\b')
+TABLE = extract.xpath(f"//table[{extract.has_class('table-hover')}]")
+TBODY = extract.xpath("(.//tbody)[1]")
+ROWS = extract.xpath(".//tr")
+CELLS = extract.xpath(".//td")
+TITLED_LINK = extract.xpath(".//a[@title]")
+LINK = extract.xpath(".//a")
+MAGNET_LINK = extract.xpath(".//a[starts-with(@href, 'magnet:')]")
 
 class NyaaProvider(SearchProvider):
     name = "nyaa"
+    rate_limited = True
     BASE_URL = "https://nyaa.si"
 
     def is_available(self) -> bool:
         try:
-            r = requests.get(self.BASE_URL, timeout=5)
+            r = self._get(self.BASE_URL, timeout=5)
             return r.status_code == 200
         except:
             return False
 
+    def merge_queries(self, queries: List[str]) -> str:
+        return '|'.join(f"({q})" for q in queries)
+
+    def split_query(self, query: str) -> List[str]:
+        if query.startswith('(') and query.endswith(')') and ')|(' in query:
+            return query[1:-1].split(')|(')
+        return [query]
+
     def search(self, query: str) -> List[SearchResult]:
         results = []
+        deadline = time.monotonic() + self.timeout
         try:
-            params = {"f": "0", "c": "0_0", "q": query, "s": "seeders", "o": "desc"}
-            r = requests.get(self.BASE_URL, params=params, timeout=self.timeout)
-            if r.status_code != 200:
-                return results
-            soup = BeautifulSoup(r.text, 'html.parser')
-            table = soup.find('table', class_='table-hover')
-            if not table:
-                return results
-            rows = table.find('tbody').find_all('tr')[:30]
-            for row in rows:
-                cols = row.find_all('td')
-                if len(cols) < 7:
-                    continue
-                title_tag = cols[1].find('a', title=True)
-                if not title_tag:
-                    title_tag = cols[1].find('a')
-                title = title_tag.get('title', title_tag.get_text(strip=True)) if title_tag else ""
-                seeders = self._parse_int(cols[4].get_text(strip=True))
-                leechers = self._parse_int(cols[5].get_text(strip=True))
-                downloads = self._parse_int(cols[6].get_text(strip=True))
-                magnet_tag = cols[2].find('a', href=lambda x: x and x.startswith('magnet:'))
-                magnet = magnet_tag['href'] if magnet_tag else ""
-                if not magnet:
-                    continue
-                size_tag = cols[3]
-                size_gb = self._parse_size(size_tag.get_text(strip=True))
-                import re
-                m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
-                info_hash = m.group(1).lower() if m else ""
-                results.append(SearchResult(
-                    title=title,
-                    url=magnet,
-                    seeders=seeders,
-                    leechers=leechers,
-                    size_gb=size_gb,
-                    source="nyaa",
-                    info_hash=info_hash
-                ))
+            results = self._paginate(query, lambda page: self._search_page(query, page, deadline), deadline)
         except Exception as e:
             print(f"  Nyaa error: {e}")
         return results
 
+    def _search_page(self, query: str, page: int, deadline: float) -> List[SearchResult]:
+        params = {"f": "0", "c": "0_0", "q": query, "s": "seeders", "o": "desc"}
+        timeout = self.timeout
+        if page > 1:
+            params["p"] = page
+            timeout = max(0.1, deadline - time.monotonic())
+        r = self._get(self.BASE_URL, params=params, timeout=timeout)
+        if r.status_code != 200:
+            return []
+        return self._parse_results(r.content, extract.response_encoding(r))
+
+    def _parse_results(self, content: bytes, encoding: str = 'utf-8') -> List[SearchResult]:
+        results = []
+        fragment = extract.slice_block(content, TABLE_START, b'</table>')
+        tables = TABLE(extract.parse(fragment, encoding))
+        if not tables:
+            return results
+        tbody = TBODY(tables[0])
+        if not tbody:
+            return results
+        for row in ROWS(tbody[0]):
+            cols = CELLS(row)
+            if len(cols) < 7:
+                continue
+            title_tag = TITLED_LINK(cols[1]) or LINK(cols[1])
+            title = title_tag[0].get('title', extract.text(title_tag[0])) if title_tag else ""
+            seeders = self._parse_int(extract.text(cols[4]))
+            leechers = self._parse_int(extract.text(cols[5]))
+            downloads = self._parse_int(extract.text(cols[6]))
+            magnet_tag = MAGNET_LINK(cols[2])
+            magnet = magnet_tag[0].get('href') if magnet_tag else ""
+            if not magnet:
+                continue
+            size_gb = self._parse_size(extract.text(cols[3]))
+            m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
+            info_hash = m.group(1).lower() if m else ""
+            results.append(SearchResult(
+                title=title,
+                url=magnet,
+                seeders=seeders,
+                leechers=leechers,
+                size_gb=size_gb,
+                source="nyaa",
+                info_hash=info_hash
+            ))
+        return results
+
     def _parse_int(self, text: str) -> int:
         try:
             return int(text.replace(',', ''))
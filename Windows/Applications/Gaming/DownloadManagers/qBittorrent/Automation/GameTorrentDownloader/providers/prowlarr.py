@@ -1,5 +1,4 @@
 # providers/prowlarr.py
-import requests
 import re
 from typing import List
 from .base import SearchProvider, SearchResult
@@ -20,7 +19,7 @@ class ProwlarrProvider(SearchProvider):
             params = {"query": "test", "type": "search"}
             if self.api_key:
                 params["apikey"] = self.api_key
-            r = requests.get(url, params=params, timeout=5)
+            r = self._get(url, params=params, timeout=5)
             return r.status_code in (200, 400)
         except:
             return False
@@ -32,7 +31,7 @@ class ProwlarrProvider(SearchProvider):
             params = {"query": query, "type": "search"}
             if self.api_key:
                 params["apikey"] = self.api_key
-            r = requests.get(url, params=params, timeout=self.timeout)
+            r = self._get(url, params=params, timeout=self.timeout)
             if r.status_code != 200:
                 return results
             data = r.json()
@@ -0,0 +1,127 @@
+# providers/ratelimit.py
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+
+THROTTLE_STATUSES = (429, 503)
+
+class RateLimited(requests.exceptions.RequestException):
+    pass
+
+def parse_retry_after(value: Optional[str], now: float = None) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (now if now is not None else time.time()))
+
+class HostLimiter:
+    def __init__(self, host: str, rate: float = 2.0, burst: int = 4, concurrency: int = 4,
+                 min_rate: float = 0.2, max_rate: float = 20.0, max_concurrency: int = 16,
+                 decrease: float = 0.5):
+        self.host = host
+        self.rate = float(rate)
+        self.burst = burst
+        self.concurrency = float(concurrency)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.decrease = decrease
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, deadline: float) -> float:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.in_flight >= int(self.concurrency):
+                    wait = None
+                elif now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return now
+                remaining = deadline - now
+                if remaining <= 0 or (wait is not None and self.blocked_until > deadline):
+                    raise RateLimited(f"{self.host}: no request slot before deadline")
+                self._cond.wait(remaining if wait is None else min(wait, remaining))
+
+    def release(self, started: float, status: int = None, retry_after: float = None):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                if retry_after is not None:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+                # Requests sent before the last cut saw the old limits; one
+                # burst of 429s should only halve the limits once.
+                if started >= self.last_decrease:
+                    self.concurrency = max(1.0, self.concurrency * self.decrease)
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self.tokens = min(self.tokens, 0.0)
+                    self.last_decrease = now
+            elif status is not None:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "rate": round(self.rate, 2),
+                "concurrency": int(self.concurrency),
+                "in_flight": self.in_flight,
+                "throttled": self.throttled,
+            }
+
+class RateLimiter:
+    def __init__(self, defaults: dict = None, hosts: Dict[str, dict] = None, max_retries: int = 2):
+        self.defaults = defaults or {}
+        self.hosts = hosts or {}
+        self.max_retries = max_retries
+        self._limiters: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RateLimiter":
+        limit_config = dict(config.get('search', {}).get('rate_limits', {}))
+        hosts = limit_config.pop('hosts', {}) or {}
+        max_retries = limit_config.pop('max_retries', 2)
+        return cls(limit_config, hosts, max_retries)
+
+    def for_url(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                settings = dict(self.defaults)
+                settings.update(self.hosts.get(host, {}))
+                limiter = self._limiters[host] = HostLimiter(host, **settings)
+            return limiter
+
+    def limits(self) -> Dict[str, dict]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {l.host: l.snapshot() for l in limiters}
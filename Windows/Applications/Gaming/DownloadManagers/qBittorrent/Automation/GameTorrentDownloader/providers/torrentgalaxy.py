@@ -1,16 +1,23 @@
 # providers/torrentgalaxy.py
-import requests
-from bs4 import BeautifulSoup
+import re
 from typing import List
 from .base import SearchProvider, SearchResult
+from . import extract
+
+ROWS_START = re.compile(rb'<div[^>]*class="[^"]*\btgxtablerow\b')
+ROWS = extract.xpath(f"//div[{extract.has_class('tgxtablerow')} and {extract.has_class('txlight')}]")
+CELLS = extract.xpath(f".//div[{extract.has_class('tgxtablecell')}]")
+TITLED_LINK = extract.xpath(".//a[@title]")
+MAGNET_LINK = extract.xpath(".//a[starts-with(@href, 'magnet:')]")
 
 class TorrentGalaxyProvider(SearchProvider):
     name = "torrentgalaxy"
+    rate_limited = True
     BASE_URL = "https://torrentgalaxy.to"
 
     def is_available(self) -> bool:
         try:
-            r = requests.get(self.BASE_URL, timeout=5, headers=self._headers())
+            r = self._get(self.BASE_URL, timeout=5, headers=self._headers())
             return r.status_code == 200
         except:
             return False
@@ -23,43 +30,45 @@ class TorrentGalaxyProvider(SearchProvider):
         try:
             url = f"{self.BASE_URL}/torrents.php"
             params = {"search": query, "sort": "seeders", "order": "desc"}
-            r = requests.get(url, params=params, headers=self._headers(), timeout=self.timeout)
+            r = self._get(url, params=params, headers=self._headers(), timeout=self.timeout)
             if r.status_code != 200:
                 return results
-            soup = BeautifulSoup(r.text, 'html.parser')
-            rows = soup.select('div.tgxtablerow.txlight')
-            for row in rows[:30]:
-                cols = row.select('div.tgxtablecell')
-                if len(cols) < 8:
-                    continue
-                title_tag = cols[1].find('a', title=True)
-                if not title_tag:
-                    continue
-                title = title_tag.get('title', title_tag.get_text(strip=True))
-                seeders = self._parse_int(cols[5].get_text(strip=True))
-                leechers = self._parse_int(cols[6].get_text(strip=True))
-                size_text = cols[7].get_text(strip=True)
-                size_gb = self._parse_size(size_text)
-                magnet_tag = row.find('a', href=lambda x: x and x.startswith('magnet:'))
-                magnet = magnet_tag['href'] if magnet_tag else ""
-                if not magnet:
-                    continue
-                import re
-                m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
-                info_hash = m.group(1).lower() if m else ""
-                results.append(SearchResult(
-                    title=title,
-                    url=magnet,
-                    seeders=seeders,
-                    leechers=leechers,
-                    size_gb=size_gb,
-                    source="torrentgalaxy",
-                    info_hash=info_hash
-                ))
+            results = self._parse_results(r.content, extract.response_encoding(r))
         except Exception as e:
             print(f"  TorrentGalaxy error: {e}")
         return results
 
+    def _parse_results(self, content: bytes, encoding: str = 'utf-8') -> List[SearchResult]:
+        results = []
+        fragment = extract.slice_block(content, ROWS_START)
+        for row in ROWS(extract.parse(fragment, encoding))[:30]:
+            cols = CELLS(row)
+            if len(cols) < 8:
+                continue
+            title_tag = TITLED_LINK(cols[1])
+            if not title_tag:
+                continue
+            title = title_tag[0].get('title', extract.text(title_tag[0]))
+            seeders = self._parse_int(extract.text(cols[5]))
+            leechers = self._parse_int(extract.text(cols[6]))
+            size_gb = self._parse_size(extract.text(cols[7]))
+            magnet_tag = MAGNET_LINK(row)
+            magnet = magnet_tag[0].get('href') if magnet_tag else ""
+            if not magnet:
+                continue
+            m = re.search(r'btih:([a-fA-F0-9]{40})', magnet)
+            info_hash = m.group(1).lower() if m else ""
+            results.append(SearchResult(
+                title=title,
+                url=magnet,
+                seeders=seeders,
+                leechers=leechers,
+                size_gb=size_gb,
+                source="torrentgalaxy",
+                info_hash=info_hash
+            ))
+        return results
+
     def _parse_int(self, text: str) -> int:
         try:
             return int(text.replace(',', '').replace('.', ''))
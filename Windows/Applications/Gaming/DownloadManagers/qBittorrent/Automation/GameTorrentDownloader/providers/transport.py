@@ -0,0 +1,83 @@
+# providers/transport.py
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict
+from .ratelimit import RateLimiter, THROTTLE_STATUSES, parse_retry_after
+
+class HttpTransport:
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 16, limiter: RateLimiter = None):
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.limiter = limiter or RateLimiter()
+        self._retired: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        pools = self.adapter.poolmanager.pools
+        dispose = pools.dispose_func
+        def retire(pool):
+            self._count(self._retired, pool)
+            if dispose:
+                dispose(pool)
+        pools.dispose_func = retire
+
+    @classmethod
+    def from_config(cls, config: dict) -> "HttpTransport":
+        http_config = config.get('search', {}).get('http', {})
+        return cls(
+            pool_connections=http_config.get('pool_connections', 10),
+            pool_maxsize=http_config.get('pool_maxsize', 16),
+            limiter=RateLimiter.from_config(config),
+        )
+
+    def get(self, url: str, limited: bool = False, **kwargs) -> requests.Response:
+        if not limited:
+            return self.session.get(url, **kwargs)
+        host = self.limiter.for_url(url)
+        timeout = kwargs.get('timeout')
+        deadline = time.monotonic() + (timeout if isinstance(timeout, (int, float)) else 30)
+        attempt = 0
+        while True:
+            started = host.acquire(deadline)
+            try:
+                r = self.session.get(url, **kwargs)
+            except Exception:
+                host.release(started)
+                raise
+            retry_after = parse_retry_after(r.headers.get('Retry-After'))
+            host.release(started, r.status_code, retry_after)
+            if r.status_code not in THROTTLE_STATUSES or attempt >= self.limiter.max_retries:
+                return r
+            if retry_after is not None and time.monotonic() + retry_after > deadline:
+                return r
+            attempt += 1
+
+    def _count(self, totals: Dict[str, list], pool):
+        host = f"{pool.host}:{pool.port}" if pool.port else pool.host
+        with self._lock:
+            counts = totals.setdefault(host, [0, 0])
+            counts[0] += pool.num_requests
+            counts[1] += pool.num_connections
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            totals = {host: list(counts) for host, counts in self._retired.items()}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                self._count(totals, pool)
+        return {
+            host: {"requests": requests_made, "connections": connections,
+                   "reused": max(0, requests_made - connections)}
+            for host, (requests_made, connections) in totals.items()
+        }
+
+    def close(self):
+        self.session.close()
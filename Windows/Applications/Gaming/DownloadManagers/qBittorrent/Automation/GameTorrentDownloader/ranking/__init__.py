@@ -1,2 +1,4 @@
 from .deduplicator import Deduplicator
+from .parallel import ParallelScorer
 from .ranker import Ranker
+from .streaming import StreamingRanker
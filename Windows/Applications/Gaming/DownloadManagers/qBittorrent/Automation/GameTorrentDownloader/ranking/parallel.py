@@ -0,0 +1,87 @@
+# ranking/parallel.py
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+import numpy as np
+from matching.normalizer import QueryNormalizer
+from matching.scorer import ConfidenceScorer
+from catalog import GameCatalog
+
+_scorer: Optional[ConfidenceScorer] = None
+_matcher = None
+
+
+def _init_worker(aliases: dict, catalog_path: Optional[str], catalog_expansions: int):
+    global _scorer
+    catalog = GameCatalog(catalog_path) if catalog_path else None
+    _scorer = ConfidenceScorer(QueryNormalizer(aliases, catalog, catalog_expansions))
+
+
+def _score_batch(query: str, titles: List[str]) -> np.ndarray:
+    global _matcher
+    if _matcher is None or _matcher.query != query:
+        _matcher = _scorer.compile(query)
+    return _matcher.score_many(titles).astype(np.int8)
+
+
+class ParallelScorer:
+    def __init__(self, aliases: dict, workers: int = 0, min_results: int = 5000, batch_size: int = 2000,
+                 catalog_path: str = None, catalog_expansions: int = 2):
+        self.aliases = aliases
+        self.catalog_path = catalog_path
+        self.catalog_expansions = catalog_expansions
+        self.workers = workers or os.cpu_count() or 1
+        self.min_results = min_results
+        self.batch_size = max(1, batch_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config: dict, catalog: GameCatalog = None) -> Optional["ParallelScorer"]:
+        parallel_config = config.get('search', {}).get('parallel_scoring', {})
+        if not parallel_config.get('enabled', True):
+            return None
+        return cls(
+            config.get('aliases', {}),
+            workers=parallel_config.get('workers', 0),
+            min_results=parallel_config.get('min_results', 5000),
+            batch_size=parallel_config.get('batch_size', 2000),
+            catalog_path=catalog.path if catalog is not None else None,
+            catalog_expansions=(config.get('catalog', {}) or {}).get('max_expansions', 2),
+        )
+
+    def wants(self, count: int) -> bool:
+        return self.workers > 1 and count >= self.min_results
+
+    def _submit(self, query: str, titles: List[str]) -> list:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.aliases, self.catalog_path, self.catalog_expansions))
+        return [
+            self._pool.submit(_score_batch, query, titles[start:start + self.batch_size])
+            for start in range(0, len(titles), self.batch_size)
+        ]
+
+    @staticmethod
+    def _join(batches: List[np.ndarray]) -> np.ndarray:
+        if not batches:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(batches).astype(np.int64)
+
+    def score_many(self, query: str, titles: List[str]) -> np.ndarray:
+        return self._join([f.result() for f in self._submit(query, titles)])
+
+    async def score_many_async(self, query: str, titles: List[str]) -> np.ndarray:
+        # Waits on the pool without blocking the event loop, so provider
+        # requests in flight keep streaming while a large batch is scored.
+        futures = self._submit(query, titles)
+        try:
+            return self._join(await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -1,24 +1,52 @@
+from concurrent.futures.process import BrokenProcessPool
 from typing import List
+import numpy as np
 from providers.base import SearchResult
-from matching.scorer import ConfidenceScorer
+from matching.scorer import ConfidenceScorer, QueryMatcher
 from matching.normalizer import QueryNormalizer
 from .deduplicator import Deduplicator
+from .parallel import ParallelScorer
 
 class Ranker:
-    def __init__(self, normalizer: QueryNormalizer, scorer: ConfidenceScorer):
+    def __init__(self, normalizer: QueryNormalizer, scorer: ConfidenceScorer, parallel: ParallelScorer = None):
         self.normalizer = normalizer
         self.scorer = scorer
+        self.parallel = parallel
         self.deduplicator = Deduplicator()
 
+    def score_titles(self, matcher: QueryMatcher, titles: List[str]) -> np.ndarray:
+        if self.parallel is not None and self.parallel.wants(len(titles)):
+            try:
+                return self.parallel.score_many(matcher.query, titles)
+            except (OSError, BrokenProcessPool) as e:
+                self._serial(e)
+        return matcher.score_many(titles)
+
+    async def score_titles_async(self, matcher: QueryMatcher, titles: List[str]) -> np.ndarray:
+        if self.parallel is not None and self.parallel.wants(len(titles)):
+            try:
+                return await self.parallel.score_many_async(matcher.query, titles)
+            except (OSError, BrokenProcessPool) as e:
+                self._serial(e)
+        return matcher.score_many(titles)
+
+    def _serial(self, error: Exception):
+        print(f"  Parallel scoring error: {error}; scoring serially")
+        self.parallel = None
+
     def rank(self, query: str, results: List[SearchResult], confidence_threshold: int = 50) -> List[SearchResult]:
         deduplicated = self.deduplicator.deduplicate(results)
 
-        scored = []
-        for r in deduplicated:
-            confidence = self.scorer.score(query, r.title)
-            if confidence >= confidence_threshold:
-                scored.append((confidence, r))
+        matcher = self.scorer.compile(query)
+        confidences = self.score_titles(matcher, [r.title for r in deduplicated])
+        scored = [(int(c), r) for c, r in zip(confidences, deduplicated) if c >= confidence_threshold]
 
         scored.sort(key=lambda x: (x[0], x[1].seeders), reverse=True)
 
-        return [r for _, r in scored]
+        return self.resolve_best([r for _, r in scored])
+
+    def resolve_best(self, ranked: List[SearchResult]) -> List[SearchResult]:
+        for i, r in enumerate(ranked):
+            if r.resolve():
+                return ranked[i:]
+        return []
@@ -0,0 +1,97 @@
+import heapq
+from typing import Dict, List, Tuple
+from providers.base import SearchResult
+from .ranker import Ranker
+
+class StreamingRanker:
+    def __init__(self, ranker: Ranker, query: str, confidence_threshold: int = 50, top_k: int = 10,
+                 min_confidence: int = None, min_seeders: int = 0, min_sources: int = 1):
+        self.ranker = ranker
+        self.query = query
+        self.matcher = ranker.scorer.compile(query)
+        self.confidence_threshold = confidence_threshold
+        self.top_k = top_k
+        self.min_confidence = min_confidence
+        self.min_seeders = min_seeders
+        self.min_sources = min_sources
+        self.total = 0
+        self.sources = set()
+        self.committed = False
+        self.top: List[Tuple[int, SearchResult]] = []
+        self._seen: Dict[str, Tuple[int, SearchResult]] = {}
+        self._backlog: Dict[str, SearchResult] = {}
+
+    @classmethod
+    def from_config(cls, ranker: Ranker, query: str, config: dict) -> "StreamingRanker":
+        search_config = config.get('search', {})
+        early = search_config.get('early_commit', {})
+        return cls(
+            ranker, query,
+            confidence_threshold=search_config.get('confidence_threshold', 50),
+            top_k=early.get('top_k', 10),
+            min_confidence=early.get('min_confidence', 90) if early.get('enabled', True) else None,
+            min_seeders=early.get('min_seeders', 50),
+            min_sources=early.get('min_sources', 1),
+        )
+
+    def add(self, source: str, results: List[SearchResult]) -> bool:
+        self._buffer(source, results)
+        return self.flush()
+
+    async def add_async(self, source: str, results: List[SearchResult]) -> bool:
+        # With a process pool, batches wait in the backlog until together
+        # they are worth sending to it. The caller scores a smaller backlog
+        # with flush_async() once the stream goes quiet.
+        self._buffer(source, results)
+        parallel = self.ranker.parallel
+        if parallel is not None and parallel.workers > 1 and not parallel.wants(len(self._backlog)):
+            return self.committed
+        return await self.flush_async()
+
+    def flush(self) -> bool:
+        backlog, self._backlog = self._backlog, {}
+        return self._merge(backlog, self.ranker.score_titles(self.matcher, [r.title for r in backlog.values()]))
+
+    async def flush_async(self) -> bool:
+        backlog, self._backlog = self._backlog, {}
+        return self._merge(backlog, await self.ranker.score_titles_async(self.matcher,
+                                                                         [r.title for r in backlog.values()]))
+
+    def _buffer(self, source: str, results: List[SearchResult]):
+        self.sources.add(source)
+        self.total += len(results)
+        for r in results:
+            key = r.info_hash if r.info_hash else r.url
+            existing = self._backlog.get(key) or self._seen.get(key, (None, None))[1]
+            if existing is not None and r.seeders <= existing.seeders:
+                continue
+            self._backlog[key] = r
+
+    def _merge(self, fresh: Dict[str, SearchResult], confidences) -> bool:
+        if not fresh:
+            return self.committed
+        changed = False
+        for (key, r), confidence in zip(fresh.items(), confidences):
+            changed = changed or confidence >= self.confidence_threshold or key in self._seen
+            self._seen[key] = (int(confidence), r)
+        if changed:
+            self.top = heapq.nlargest(self.top_k, self._candidates(), key=lambda x: (x[0], x[1].seeders))
+        if not self.committed and self._should_commit():
+            self.committed = True
+        return self.committed
+
+    def _candidates(self):
+        return (entry for entry in self._seen.values() if entry[0] >= self.confidence_threshold)
+
+    def _should_commit(self) -> bool:
+        if self.min_confidence is None or not self.top or len(self.sources) < self.min_sources:
+            return False
+        confidence, best = self.top[0]
+        return confidence >= self.min_confidence and best.seeders >= self.min_seeders
+
+    def ranked(self) -> List[SearchResult]:
+        if self._backlog:
+            self.flush()
+        scored = list(self._candidates())
+        scored.sort(key=lambda x: (x[0], x[1].seeders), reverse=True)
+        return self.ranker.resolve_best([r for _, r in scored])
@@ -0,0 +1,106 @@
+# search/cache.py
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import List, Optional, Tuple
+from providers.base import SearchResult
+from providers.magnet_cache import cache_dir
+
+RESULT_FIELDS = [f.name for f in fields(SearchResult) if f.compare]
+
+class ResultCache:
+    def __init__(self, path, ttl: float = 21600, negative_ttl: float = 1800,
+                 max_stale: float = 604800, clock=time.time):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_stale = max_stale
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "provider TEXT NOT NULL, query TEXT NOT NULL, payload TEXT NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (provider, query))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS negatives ("
+            "provider TEXT NOT NULL, query TEXT NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (provider, query))"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["ResultCache"]:
+        cache_config = config.get('search', {}).get('cache', {})
+        if not cache_config.get('enabled', True):
+            return None
+        return cls(
+            cache_dir(config) / "search_results.sqlite3",
+            ttl=cache_config.get('ttl', 21600),
+            negative_ttl=cache_config.get('negative_ttl', 1800),
+            max_stale=cache_config.get('max_stale', 604800),
+        )
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    def get(self, provider: str, query: str) -> Optional[Tuple[List[SearchResult], bool]]:
+        key = (provider, self.normalize_query(query))
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, stored_at FROM results WHERE provider = ? AND query = ?", key
+            ).fetchone()
+            if row and now - row[1] < self.ttl + self.max_stale:
+                fresh = now - row[1] < self.ttl
+                if fresh:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                return [SearchResult(**item) for item in json.loads(row[0])], fresh
+            negative = self._conn.execute(
+                "SELECT stored_at FROM negatives WHERE provider = ? AND query = ?", key
+            ).fetchone()
+            if negative and now - negative[0] < self.negative_ttl:
+                self.negative_hits += 1
+                return [], True
+            self.misses += 1
+        return None
+
+    def put(self, provider: str, query: str, results: List[SearchResult]):
+        key = (provider, self.normalize_query(query))
+        now = self.clock()
+        with self._lock:
+            if results:
+                payload = json.dumps([{name: getattr(r, name) for name in RESULT_FIELDS} for r in results])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (provider, query, payload, stored_at) VALUES (?, ?, ?, ?)",
+                    key + (payload, now),
+                )
+                self._conn.execute("DELETE FROM negatives WHERE provider = ? AND query = ?", key)
+            else:
+                self._conn.execute("DELETE FROM results WHERE provider = ? AND query = ?", key)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO negatives (provider, query, stored_at) VALUES (?, ?, ?)",
+                    key + (now,),
+                )
+            self._conn.commit()
+
+    def summary(self) -> str:
+        return (f"{self.hits} hits, {self.stale_hits} stale hits, "
+                f"{self.negative_hits} negative hits, {self.misses} misses")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,82 @@
+# search/coalesce.py
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+from providers.base import SearchResult
+
+Publish = Callable[[List[SearchResult]], None]
+
+
+class _Flight:
+    def __init__(self, fetch: Callable[[Publish], Awaitable[None]], on_done: Callable[[], None]):
+        self.batches: List[List[SearchResult]] = []
+        self.subscribers = 0
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self.task = asyncio.ensure_future(self._run(fetch))
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _run(self, fetch):
+        def publish(batch):
+            self.batches.append(batch)
+            asyncio.ensure_future(self._notify())
+
+        try:
+            await fetch(publish)
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._on_done()
+            await self._notify()
+
+    async def subscribe(self) -> AsyncIterator[List[SearchResult]]:
+        self.subscribers += 1
+        seen = 0
+        try:
+            while True:
+                while seen < len(self.batches):
+                    seen += 1
+                    yield self.batches[seen - 1]
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.done or seen < len(self.batches))
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.task.cancel()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def reset(self):
+        self._flights = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def join(self, key: Hashable, fetch: Callable[[Publish], Awaitable[None]]) -> AsyncIterator[List[SearchResult]]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(fetch, lambda: self._flights.pop(key, None))
+            self._flights[key] = flight
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        return flight.subscribe()
+
+    def summary(self) -> str:
+        return f"{self.calls} provider calls, {self.coalesced} duplicates coalesced"
@@ -0,0 +1,255 @@
+# search/engine.py
+import asyncio
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import List, Tuple
+from providers.base import SearchProvider, SearchResult, UNKNOWN, OPEN, HALF_OPEN
+from .cache import ResultCache
+from .coalesce import SingleFlight
+from .planner import QueryPlanner
+
+
+def _acquire(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore) -> bool:
+    # Background refreshes run on their own threads but take a slot from the
+    # same semaphore as normal fetches while its loop is alive. Once the loop
+    # has closed nothing else is fetching, so they go ahead without one.
+    try:
+        future = asyncio.run_coroutine_threadsafe(slots.acquire(), loop)
+    except RuntimeError:
+        return False
+    while True:
+        try:
+            return future.result(timeout=0.1)
+        except FuturesTimeout:
+            if loop.is_closed():
+                future.cancel()
+                return False
+        except CancelledError:
+            return False
+
+
+def _release(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore):
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:
+        pass
+
+
+class SearchEngine:
+    def __init__(self, providers: list, config: dict, cache: ResultCache = None, planner: QueryPlanner = None):
+        search_config = config.get('search', {})
+        self.providers = providers
+        self.timeout = search_config.get('timeout_per_source', 15)
+        self.max_concurrency = search_config.get('max_concurrency', 16)
+        self._semaphore = None
+        self._probes = {}
+        self._loop = None
+        self.cache = cache
+        self.planner = planner
+        self.flights = SingleFlight()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+        SearchProvider.health.configure(config)
+
+    def run(self, coro):
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_concurrency * 2 + 4))
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            try:
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                # close() shuts the executor down without waiting, so threads
+                # still finishing cancelled searches do not hold up the caller.
+                asyncio.set_event_loop(None)
+                loop.close()
+
+    def _limit(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._probes = {}
+            self.flights.reset()
+        return self._semaphore
+
+    def plan(self, providers: list, queries: list) -> List[Tuple[SearchProvider, str]]:
+        if self.planner is not None:
+            return self.planner.plan(providers, queries)
+        return [(p, q) for q in queries for p in providers]
+
+    async def _probe(self, provider: SearchProvider) -> bool:
+        try:
+            online = await asyncio.to_thread(provider.is_available)
+        except:
+            online = False
+        if online:
+            provider.health.record_success(provider.name)
+        else:
+            provider.health.record_failure(provider.name, fatal=True)
+        return online
+
+    async def _check(self, provider: SearchProvider, log) -> bool:
+        name = provider.name
+        if provider.health.state(name) == UNKNOWN:
+            self._limit()
+            if name not in self._probes:
+                self._probes[name] = asyncio.ensure_future(self._probe(provider))
+            online = await self._probes[name]
+            log(f"  [{name}] {'Online' if online else 'Offline'}")
+            return online
+        # A half-open provider stays in the plan; its trial request is only
+        # claimed by _fetch, since the cache may answer every query.
+        if provider.health.state(name) == OPEN:
+            log(f"  [{name}] Circuit open, skipping")
+            return False
+        return True
+
+    async def available(self, log=print) -> list:
+        states = await asyncio.gather(*(self._check(p, log) for p in self.providers))
+        return [p for p, online in zip(self.providers, states) if online]
+
+    @staticmethod
+    def _outcome(provider: SearchProvider) -> Tuple[int, int, int]:
+        health, name = provider.health, provider.name
+        return health.failure_count(name), health.partial_count(name), health.throttled_count(name)
+
+    def _store(self, provider: SearchProvider, query: str, results: List[SearchResult], before: Tuple[int, int, int]):
+        if self.cache is None:
+            return
+        failures, partials, throttled = self._outcome(provider)
+        if partials != before[1] or throttled != before[2]:
+            # Cut short by a deadline or turned away by the host; caching it
+            # would serve the truncated list until it expires.
+            return
+        if results or failures == before[0]:
+            self.cache.put(provider.name, query, results)
+
+    def _refresh(self, provider: SearchProvider, query: str):
+        key = (provider.name, ResultCache.normalize_query(query))
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        loop, slots = asyncio.get_running_loop(), self._limit()
+
+        def refresh():
+            held = _acquire(loop, slots)
+            try:
+                before = self._outcome(provider)
+                self._store(provider, query, provider.search(query), before)
+            except Exception:
+                pass
+            finally:
+                if held:
+                    _release(loop, slots)
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(refresh)
+
+    def _cached(self, provider: SearchProvider, query: str, log):
+        if self.cache is None:
+            return None
+        cached = self.cache.get(provider.name, query)
+        if cached is None:
+            return None
+        results, fresh = cached
+        results = [provider.restore(r) for r in results]
+        if not fresh:
+            self._refresh(provider, query)
+        log(f"  [{provider.name}] {len(results)} cached results for '{query}'{'' if fresh else ' (stale, refreshing)'}")
+        return results
+
+    async def _fetch(self, provider: SearchProvider, query: str, log, publish):
+        async with self._limit():
+            trial = provider.health.state(provider.name) == HALF_OPEN
+            if not provider.health.allow(provider.name):
+                return
+            results = []
+
+            async def drain():
+                async for batch in provider.iter_search_async(query):
+                    results.extend(batch)
+                    publish(batch)
+
+            try:
+                before = self._outcome(provider)
+                await asyncio.wait_for(drain(), timeout=self.timeout + 5)
+                self._store(provider, query, results, before)
+            except asyncio.TimeoutError:
+                provider.health.record_failure(provider.name)
+                log(f"  [{provider.name}] Timeout for '{query}'")
+                return
+            except Exception as e:
+                log(f"  [{provider.name}] Error: {e}")
+                return
+            finally:
+                if trial:
+                    provider.health.release(provider.name)
+        log(f"  [{provider.name}] Found {len(results)} results for '{query}'")
+
+    async def _search_one(self, provider: SearchProvider, query: str, log, emit):
+        cached = self._cached(provider, query, log)
+        if cached is not None:
+            emit(provider, query, cached)
+            return
+        key = (provider.name, ResultCache.normalize_query(query))
+        self._limit()
+        if self.flights.in_flight(key):
+            log(f"  [{provider.name}] Sharing in-flight search for '{query}'")
+        emitted = False
+        try:
+            async for batch in self.flights.join(key, lambda publish: self._fetch(provider, query, log, publish)):
+                emitted = True
+                emit(provider, query, batch)
+        except Exception as e:
+            log(f"  [{provider.name}] Error: {e}")
+        if not emitted:
+            emit(provider, query, [])
+
+    async def stream(self, pairs: list, log=print, quiet: bool = False):
+        # With quiet=True a None is yielded whenever every batch that has
+        # arrived so far has been handed out.
+        queue = asyncio.Queue()
+        emit = lambda provider, query, batch: queue.put_nowait((provider, query, batch))
+        tasks = [asyncio.ensure_future(self._search_one(p, q, log, emit)) for p, q in pairs]
+        finished = asyncio.gather(*tasks, return_exceptions=True)
+        finished.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            pending = False
+            while True:
+                if quiet and pending and queue.empty():
+                    pending = False
+                    yield None
+                item = await queue.get()
+                if item is None:
+                    break
+                pending = True
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def search_async(self, queries: list, log=print) -> List[SearchResult]:
+        providers = await self.available(log)
+        if not providers:
+            log("  WARNING: No search providers available!")
+            return []
+        all_results = []
+        async for _, _, results in self.stream(self.plan(providers, queries), log):
+            all_results.extend(results)
+        return all_results
+
+    def search(self, queries: list, log=print) -> List[SearchResult]:
+        return self.run(self.search_async(queries, log))
+
+    def close(self, wait: bool = True):
+        self._refresh_pool.shutdown(wait=wait)
@@ -0,0 +1,53 @@
+# search/planner.py
+from typing import List, Tuple
+from providers.base import SearchProvider
+from matching.normalizer import QueryNormalizer
+
+
+class QueryPlanner:
+    def __init__(self, normalizer: QueryNormalizer, config: dict = None):
+        planner_config = (config or {}).get('search', {}).get('planner', {})
+        self.normalizer = normalizer
+        self.merge_or = planner_config.get('merge_or', True)
+        self.reuse_broader = planner_config.get('reuse_broader', True)
+        self.min_broad_tokens = planner_config.get('min_broad_tokens', 2)
+
+    def _token_set(self, query: str) -> frozenset:
+        return frozenset(self.normalizer.normalize_roman(query).split())
+
+    def collapse(self, queries: List[str]) -> List[str]:
+        variants = []
+        seen = set()
+        for q in queries:
+            tokens = self._token_set(q)
+            if not tokens or tokens in seen:
+                continue
+            seen.add(tokens)
+            variants.append((q, tokens))
+        if not self.reuse_broader or not variants:
+            return [q for q, _ in variants]
+        # Providers cap and paginate their results, so a broader query does
+        # not return everything a narrower one would. Only alias variants
+        # are dropped in its favour, never the term itself or the catalog
+        # names it resolved to, which are the sharper queries.
+        pinned = {queries[0], *self.normalizer.catalog_names(queries[0])}
+        kept = []
+        for q, tokens in variants:
+            covered = q not in pinned and any(
+                other < tokens and len(other) >= self.min_broad_tokens
+                for _, other in variants
+            )
+            if not covered:
+                kept.append(q)
+        return kept
+
+    def plan(self, providers: List[SearchProvider], queries: List[str]) -> List[Tuple[SearchProvider, str]]:
+        variants = self.collapse(queries)
+        pairs = []
+        for provider in providers:
+            merged = provider.merge_queries(variants) if self.merge_or and len(variants) > 1 else None
+            if merged:
+                pairs.append((provider, merged))
+            else:
+                pairs.extend((provider, q) for q in variants)
+        return pairs
@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from catalog import GameCatalog, build_index, load_entries
+from matching.normalizer import QueryNormalizer
+from search.planner import QueryPlanner
+from providers.base import SearchProvider
+
+CSV = """title,aliases
+Cyberpunk 2077,cp2077
+Cyberpunk 2077: Phantom Liberty,
+Red Dead Redemption,rdr
+Red Dead Redemption 2,rdr2|red dead redemption ii
+Pokémon Legends: Arceus,
+"""
+
+def make_catalog(tmp):
+    source = os.path.join(tmp, "games.csv")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(CSV)
+    build_index(load_entries(source), os.path.join(tmp, "catalog.idx"))
+    return GameCatalog(os.path.join(tmp, "catalog.idx"))
+
+def test_catalog_resolves_loose_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = make_catalog(tmp)
+        try:
+            assert len(catalog) == 5
+            assert catalog.resolve("cyberpunk") == ["Cyberpunk 2077", "Cyberpunk 2077: Phantom Liberty"]
+            assert catalog.resolve("red dead", 2) == ["Red Dead Redemption", "Red Dead Redemption 2"]
+            assert catalog.resolve("RDR2") == catalog.resolve("red dead redemption ii") == ["Red Dead Redemption 2"]
+            assert catalog.resolve("dead red") == ["Red Dead Redemption", "Red Dead Redemption 2"]
+            assert catalog.resolve("pokemon leg") == ["Pokémon Legends: Arceus"]
+            assert catalog.resolve("half life") == []
+        finally:
+            catalog.close()
+
+def test_catalog_feeds_normalizer_expansions():
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "games.json"), "w", encoding="utf-8") as f:
+            json.dump(["Elden Ring", {"title": "Hollow Knight", "aliases": ["hk"]}], f)
+        assert load_entries(os.path.join(tmp, "games.json")) == [("Elden Ring", []), ("Hollow Knight", ["hk"])]
+        catalog = make_catalog(tmp)
+        try:
+            q = QueryNormalizer({"cp77": ["cyberpunk"]}, catalog, 1)
+            assert q.expand("cp77") == ["cp77", "cyberpunk"]
+            assert q.expand("cyberpunk") == ["cyberpunk", "cp77", "cyberpunk 2077"]
+        finally:
+            catalog.close()
+
+def test_planner_keeps_catalog_names():
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = make_catalog(tmp)
+        try:
+            planner = QueryPlanner(QueryNormalizer({"red dead redemption 2": ["rdr2"]}, catalog))
+            assert planner.normalizer.expand("red dead") == ["red dead", "red dead redemption", "red dead redemption 2"]
+            pairs = planner.plan([SearchProvider({})], planner.normalizer.expand("red dead"))
+            assert [q for _, q in pairs] == ["red dead", "red dead redemption", "red dead redemption 2"]
+            assert planner.collapse(["red dead redemption 2", "red dead redemption 2 ultimate edition"]) == [
+                "red dead redemption 2"]
+        finally:
+            catalog.close()
+
+def test_index_rebuilds_when_the_source_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        newer, older = os.path.join(tmp, "newer.json"), os.path.join(tmp, "older.json")
+        for path, titles in ((older, ["Hollow Knight"]), (newer, ["Elden Ring", "Hades"])):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(titles, f)
+        os.utime(older, (1_000_000, 1_000_000))
+        config = {"search": {"cache_dir": tmp}, "catalog": {"source": newer}}
+        catalog = GameCatalog.from_config(config)
+        assert len(catalog) == 2
+        catalog.close()
+        config["catalog"]["source"] = older
+        catalog = GameCatalog.from_config(config)
+        assert catalog.resolve("hollow") == ["Hollow Knight"]
+        catalog.close()
+
+if __name__ == "__main__":
+    test_catalog_resolves_loose_names()
+    test_catalog_feeds_normalizer_expansions()
+    test_planner_keeps_catalog_names()
+    test_index_rebuilds_when_the_source_changes()
+    print("All catalog tests passed!")
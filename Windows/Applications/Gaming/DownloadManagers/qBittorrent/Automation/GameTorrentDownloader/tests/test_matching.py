@@ -21,6 +21,15 @@ def test_alias_expansion_gta_5():
     expanded = q.expand("GTA 5")
     assert "gta v" in expanded
 
+def test_alias_expansion_order_with_large_catalog():
+    aliases = {"franchise %d" % i: ["fr%d" % i, "franchise %d remastered" % i] for i in range(5000)}
+    aliases["Dark Souls"] = ["DS3", "dark souls 3", "dark-souls iii"]
+    q = QueryNormalizer(aliases)
+    assert q.expand("ds3") == ["ds3", "dark souls", "dark souls 3", "dark souls iii"]
+    assert q.expand("fr4999") == ["fr4999", "franchise 4999 remastered", "franchise 4999"]
+    expanded = q.expand("remastered")
+    assert expanded[:3] == ["remastered", "fr0", "franchise 0 remastered"] and len(expanded) == 10001
+
 def test_strips_version_numbers():
     q = QueryNormalizer({})
     tokens = q.tokenize("Game v1.2.3 Enhanced Edition")
@@ -79,10 +88,125 @@ def test_scoring_movie_penalty():
     score = s.score("elden ring", "Elden.Ring.2022.1080p.WEB-DL.x264")
     assert score == 0
 
+def test_compiled_matcher_matches_score():
+    # Expected scores come from the scorer as it was before queries were
+    # compiled, so this pins the compiled path to the old behaviour.
+    s = ConfidenceScorer(QueryNormalizer({"gta v": ["gta 5", "grand theft auto v"]}))
+    titles = ["Grand.Theft.Auto.V.v1.68-FitGirl.Repack", "GTA 5 Premium Edition [95 GB]",
+              "Grand.Theft.Auto.V-PLAZA", "GTA.V.2013.1080p.BluRay", "gta v v1.0 DODI", "Elden Ring"]
+    expected = {
+        "gta v": [100, 100, 100, 0, 100, 0],
+        "GTA V v1.68": [25, 28, 0, 0, 14, 0],
+        "grand theft auto v": [100, 43, 100, 0, 46, 0],
+    }
+    for query, scores in expected.items():
+        matcher = s.compile(query)
+        assert [matcher.score(t) for t in titles] == scores
+        assert [s.score(query, t) for t in titles] == scores
+
+def test_score_many_matches_score():
+    s = ConfidenceScorer(QueryNormalizer({"dark souls": ["ds3", "dark souls 3"]}))
+    titles = ["Dark.Souls.III.Deluxe.Edition-FitGirl.Repack [25.3 GB]", "DS3 v1.15 GOG", "dark souls 3 souls dark",
+              "Dark Souls 2011 Remastered game", "Dark Souls OST 320kbps 150 MB", "Souls.Dark.S01E02.1080p",
+              "Dark Souls Prepare To Die pc game 8 GB", "", "Elden Ring", "dark_souls_iii steamrip 1.2 TB"]
+    for query in ["dark souls", "Dark Souls III v1.15", "ds3"]:
+        assert s.score_many(query, titles).tolist() == [s.score(query, t) for t in titles]
+
+from matching.markers import MarkerAutomaton, MARKERS, MOVIE, TV, GROUP, EDITION, MARKER_TABLES
+
+def test_marker_automaton_finds_every_category():
+    hits = MARKERS.scan("dark souls iii s01e02 goty edition fitgirl 1080p")
+    assert hits & TV and hits & EDITION and hits & GROUP and hits & MOVIE
+    assert MARKERS.scan("elden ring") & GROUP == 0
+    automaton = MarkerAutomaton({1: ["he", "she", "hers"], 2: ["his"]})
+    assert automaton.scan("ushers") == 1
+    assert automaton.scan("this") == 2
+    for category, markers in MARKER_TABLES.items():
+        for marker in markers:
+            assert MARKERS.scan("xx" + marker + "xx") & category
+
+from matching.parsed import TitleCache
+
+def test_title_cache_is_shared_and_bounded():
+    titles = TitleCache(max_titles=2)
+    s = ConfidenceScorer(QueryNormalizer({}), titles)
+    assert s.detector.titles is titles
+    s.score("elden ring", "Elden Ring v1.12-FitGirl Repack")
+    s.score("elden ring 2", "Elden Ring v1.12-FitGirl Repack")
+    assert titles.misses == 1 and titles.hits == 1
+    parsed = titles.get("Elden Ring v1.12-FitGirl Repack")
+    assert parsed.tokens == ["elden", "ring", "v1", "12", "fitgirl", "repack"]
+    assert parsed.version == "1.12"
+    titles.get("Dark Souls III")
+    titles.get("Hades")
+    assert len(titles) == 2
+    assert titles.get("Elden Ring v1.12-FitGirl Repack") is not parsed
+    assert "hit rate" in titles.summary()
+
+def test_title_vocabulary_resets_after_turnover():
+    titles = TitleCache(max_titles=4, max_tokens=40)
+    s = ConfidenceScorer(QueryNormalizer({}), titles)
+    matcher = s.compile("dark souls iii")
+    before = titles.get("Dark Souls III [FitGirl Repack]")
+    for i in range(50):
+        titles.get(f"Junk {i:x}{i * 7919:x} release")
+    assert titles.vocab_resets > 0
+    assert len(titles.vocab) <= 40 + 3 * 5
+    assert before.vocab is not titles.vocab
+    assert matcher.score("Dark Souls III [FitGirl Repack]") == matcher._score_parsed(before) == 100
+    assert "vocabulary resets" in titles.summary()
+
+from matching.fuzzy import NearIndex, coverage, distance, edit_bound
+
+def test_fuzzy_tokens_are_bounded():
+    assert edit_bound("gate") == 0 and edit_bound("witcher3") == 0
+    assert edit_bound("hollow") == 1 and edit_bound("cyberpunk") == 2
+    index = NearIndex(["hollow", "knight", "holow", "hallow", "night", "knights", "follow"])
+    assert sorted(index.search("hollow", 1)) == ["hallow", "hollow", "holow"]
+    assert distance("cyberpunk", "cyberpnuk", 2) == 2 and distance("cyberpunk", "corpus", 2) == 3
+    assert coverage(["witcher", "3"], ["the", "witcher3", "goty"]) == 2
+    assert coverage(["witcher3"], ["witcher", "3"]) == 1
+    assert coverage(["elden", "ring"], ["golden", "ring"]) == 1
+    assert coverage(["witcher", "3"], ["witcher", "2"]) == 1
+
+def test_fuzzy_tier_scores_below_exact():
+    s = ConfidenceScorer(QueryNormalizer({}))
+    titles = ["Hollow Knight GOG", "Holow Knight GOG", "Hollow Knght GOG", "Golden Knight GOG", "HollowKnight GOG"]
+    scores = [s.score("hollow knight", t) for t in titles]
+    assert 50 <= scores[1] == scores[2] == scores[4] < scores[0]
+    assert scores[3] < 50
+    assert s.score_many("hollow knight", titles).tolist() == scores
+
+from matching.parsed import ParsedTitle
+from matching.vocab import VOCAB, token_counts
+
+def test_titles_hold_shared_token_ids():
+    a = ParsedTitle("Witcher III Wild Hunt [FitGirl Repack]")
+    b = ParsedTitle("The Witcher 3 Wild Hunt")
+    assert a.tokens == ["witcher", "iii", "wild", "hunt", "fitgirl", "repack"]
+    assert a.roman_tokens[:4] == b.roman_tokens[1:]
+    assert a.roman_ids[1] == b.token_ids[2] == VOCAB.intern("3")
+    assert b.roman_ids is b.token_ids
+
+from matching.alignment import Alignment, LONG_TITLE_TOKENS
+
+def test_long_titles_align_like_short_ones():
+    query = VOCAB.encode(["witcher", "3", "witcher"])
+    counts = token_counts(query)
+    for tokens, ordered in ((["3", "witcher", "x", "witcher"], False), (["witcher", "x", "3", "witcher"], True),
+                            (["witcher", "3"], False)):
+        short = Alignment(VOCAB.encode(tokens), set(query))
+        long = Alignment(VOCAB.encode(["pad"] * LONG_TITLE_TOKENS + tokens), set(query))
+        assert short.positions is None and long.positions is not None
+        assert long.matched(counts) == short.matched(counts) == min(len(tokens), 3)
+        assert long.ordered(query) == short.ordered(query) == ordered
+
+
 if __name__ == "__main__":
     test_basic_normalization()
     test_alias_expansion_gta_v()
     test_alias_expansion_gta_5()
+    test_alias_expansion_order_with_large_catalog()
     test_strips_version_numbers()
     test_platform_normalization()
     test_edition_normalization()
@@ -95,4 +219,13 @@ if __name__ == "__main__":
     test_scoring_partial_match()
     test_scoring_no_match()
     test_scoring_movie_penalty()
+    test_compiled_matcher_matches_score()
+    test_score_many_matches_score()
+    test_marker_automaton_finds_every_category()
+    test_title_cache_is_shared_and_bounded()
+    test_title_vocabulary_resets_after_turnover()
+    test_fuzzy_tokens_are_bounded()
+    test_fuzzy_tier_scores_below_exact()
+    test_titles_hold_shared_token_ids()
+    test_long_titles_align_like_short_ones()
     print("All detection + scoring tests passed!")
\ No newline at end of file
@@ -1,7 +1,25 @@
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-from providers.base import SearchResult
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from providers.base import SearchProvider, SearchResult, OPEN
+from providers.transport import HttpTransport
+from providers.ratelimit import HostLimiter, RateLimiter, RateLimited, parse_retry_after
+from pathlib import Path
+from providers.leetx import LeetxProvider
+from providers.jackett import JackettProvider
+from providers.nyaa import NyaaProvider
+from providers.thepiratebay import ThePirateBayProvider
+from providers.torrentgalaxy import TorrentGalaxyProvider
+from matching.normalizer import QueryNormalizer
+from matching.scorer import ConfidenceScorer
+from ranking.ranker import Ranker
+from search.engine import SearchEngine
+from search.cache import ResultCache
 
 def test_search_result_creation():
     r = SearchResult(
@@ -21,7 +39,415 @@ def test_search_result_is_magnet():
     r = SearchResult(title="test", url="https://example.com/torrent.torrent", seeders=10, leechers=5, size_gb=1.0, source="test", info_hash="")
     assert r.is_magnet == False
 
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class ThrottlingHandler(KeepAliveHandler):
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        if type(self).hits == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+def test_transport_reuses_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = HttpTransport(pool_connections=2, pool_maxsize=2)
+        url = f"http://127.0.0.1:{server.server_port}/q"
+        for _ in range(5):
+            assert transport.get(url, timeout=5).status_code == 200
+        stats = transport.stats()[f"127.0.0.1:{server.server_port}"]
+        assert stats["requests"] == 5
+        assert stats["connections"] == 1
+        assert stats["reused"] == 4
+        transport.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.content = text.encode()
+        self.status_code = status_code
+        self.headers = {}
+
+def leetx_search_page(count):
+    rows = "".join(
+        f'<tr><td><a class="name" href="/torrent/{i}/game-{i}/">Game {i}-RUNE</a></td>'
+        f'<td>{100 - i}</td><td>5</td><td>x</td><td>{10 + i} GB</td><td>x</td><td>x</td></tr>'
+        for i in range(count)
+    )
+    return f'<html><body><table class="table-list"><tbody>{rows}</tbody></table></body></html>'
+
+def leetx_detail_page(i):
+    return f'<html><body><a href="magnet:?xt=urn:btih:{i:040x}&dn=game">Magnet</a></body></html>'
+
+def test_transport_retries_throttled_request_and_backs_off():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        limiter = RateLimiter({"rate": 4, "burst": 4, "concurrency": 4})
+        transport = HttpTransport(limiter=limiter)
+        url = f"http://127.0.0.1:{server.server_port}/q"
+        assert transport.get(url, limited=True, timeout=5).status_code == 200
+        limits = limiter.limits()[f"127.0.0.1:{server.server_port}"]
+        assert limits["throttled"] == 1
+        assert limits["concurrency"] == 2
+        assert limits["in_flight"] == 0
+        transport.close()
+    finally:
+        server.shutdown()
+
+def test_host_limiter_aimd_and_deadline():
+    host = HostLimiter("example", rate=100, burst=10, concurrency=2, max_concurrency=4)
+    first = host.acquire(time.monotonic() + 1)
+    second = host.acquire(time.monotonic() + 1)
+    try:
+        host.acquire(time.monotonic() + 0.05)
+        assert False, "concurrency limit not enforced"
+    except RateLimited:
+        pass
+    host.release(first, 429, retry_after=None)
+    host.release(second, 429, retry_after=None)
+    assert host.concurrency == 1.0 and host.rate == 50.0
+    for _ in range(20):
+        host.release(host.acquire(time.monotonic() + 1), 200)
+    assert host.concurrency > 1.0
+    host.release(host.acquire(time.monotonic() + 1), 503, retry_after=30)
+    try:
+        host.acquire(time.monotonic() + 1)
+        assert False, "Retry-After not honoured"
+    except RateLimited:
+        pass
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470.0) == 10.0
+
+def make_leetx(tmp, timeout=15, lazy=False):
+    return LeetxProvider({"search": {"cache_dir": tmp, "timeout_per_source": timeout,
+                                     "detail_concurrency": 4, "lazy_magnets": lazy}})
+
+def test_leetx_resolves_detail_pages_concurrently_and_caches():
+    with tempfile.TemporaryDirectory() as tmp:
+        p = make_leetx(tmp)
+        detail_calls = []
+        def fake_get(url, **kwargs):
+            if "/search/" in url:
+                return FakeResponse(leetx_search_page(8))
+            detail_calls.append(url)
+            time.sleep(0.1)
+            i = int(url.split("/torrent/")[1].split("/")[0])
+            return FakeResponse(leetx_detail_page(i))
+        p._get = fake_get
+        start = time.monotonic()
+        results = p.search("game")
+        assert time.monotonic() - start < 0.5
+        assert len(results) == 8
+        assert results[0].info_hash == f"{0:040x}"
+        assert len(detail_calls) == 8
+        again = make_leetx(tmp)
+        again._get = fake_get
+        assert len(again.search("game")) == 8
+        assert len(detail_calls) == 8
+
+def test_leetx_returns_partial_results_at_deadline():
+    with tempfile.TemporaryDirectory() as tmp:
+        p = make_leetx(tmp, timeout=0.5)
+        def fake_get(url, **kwargs):
+            if "/search/" in url:
+                return FakeResponse(leetx_search_page(3))
+            i = int(url.split("/torrent/")[1].split("/")[0])
+            if i == 2:
+                time.sleep(1.0)
+            return FakeResponse(leetx_detail_page(i))
+        p._get = fake_get
+        results = p.search("game")
+        assert sorted(r.title for r in results) == ["Game 0-RUNE", "Game 1-RUNE"]
+
+def test_leetx_lazy_magnets_resolve_only_the_winner():
+    with tempfile.TemporaryDirectory() as tmp:
+        p = make_leetx(tmp, lazy=True)
+        titles = ["Elden Ring-RUNE [50 GB]", "Elden.Ring.2022.1080p.WEB-DL.x264", "Elden Ring Nightreign-RUNE"]
+        detail_calls = []
+        def fake_get(url, **kwargs):
+            if "/search/" in url:
+                rows = "".join(
+                    f'<tr><td><a class="name" href="/torrent/{i}/x/">{t}</a></td>'
+                    f'<td>{100 - i}</td><td>5</td><td>x</td><td>50 GB</td><td>x</td><td>x</td></tr>'
+                    for i, t in enumerate(titles)
+                )
+                return FakeResponse(f'<table class="table-list"><tbody>{rows}</tbody></table>')
+            detail_calls.append(url)
+            i = int(url.split("/torrent/")[1].split("/")[0])
+            return FakeResponse(leetx_detail_page(i))
+        p._get = fake_get
+        results = p.search("elden ring")
+        assert len(results) == 3
+        assert all(r.is_pending for r in results)
+        assert detail_calls == []
+        n = QueryNormalizer({})
+        ranked = Ranker(n, ConfidenceScorer(n)).rank("elden ring", results, 50)
+        assert ranked[0].title == "Elden Ring-RUNE [50 GB]"
+        assert ranked[0].is_magnet
+        assert ranked[0].info_hash == f"{0:040x}"
+        assert ranked[1].is_pending
+        assert len(detail_calls) == 1
+
+def test_ranker_skips_unresolvable_candidates():
+    n = QueryNormalizer({})
+    broken = SearchResult("Elden Ring-RUNE [50 GB]", "https://x/1", 500, 0, 50.0, "1337x", "", resolver=lambda: "")
+    working = SearchResult("Elden Ring-RUNE", "https://x/2", 10, 0, 50.0, "1337x", "",
+                           resolver=lambda: "magnet:?xt=urn:btih:" + "a" * 40)
+    ranked = Ranker(n, ConfidenceScorer(n)).rank("elden ring", [broken, working], 50)
+    assert ranked[0] is working
+    assert working.info_hash == "a" * 40
+    assert not broken.resolve() and broken.url == "https://x/1"
+
+def test_shared_result_resolves_once():
+    calls = []
+    def resolver():
+        calls.append(1)
+        time.sleep(0.1)
+        return "magnet:?xt=urn:btih:" + "a" * 40
+    shared = SearchResult("Elden Ring-RUNE", "https://x/1", 10, 0, 50.0, "1337x", "", resolver=resolver)
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append((shared.resolve(), shared.url[:7])))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert outcomes == [(True, "magnet:")] * 4 and calls == [1]
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+def test_lxml_extraction_on_saved_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {"search": {"cache_dir": tmp}}
+        entries = LeetxProvider(config)._parse_rows((FIXTURES / "leetx_search.html").read_bytes())
+        assert len(entries) == 40
+        assert entries[0][:4] == ("Red Dead Redemption 2 RUNE (51.0 GB) & more",
+                                  "/torrent/5000000/Red-Dead-Redemption-2-RUNE-(51.0-GB)-&-more/", 1186, 840)
+        magnet = LeetxProvider(config)._parse_magnet((FIXTURES / "leetx_detail.html").read_bytes())
+        assert magnet.startswith("magnet:?xt=urn:btih:000000000000000000000000000000009e3779b1&dn=Elden+Ring")
+        nyaa = NyaaProvider(config)._parse_results((FIXTURES / "nyaa_search.html").read_bytes())
+        assert len(nyaa) == 75
+        assert all(r.info_hash and r.is_magnet for r in nyaa)
+        tgx = TorrentGalaxyProvider(config)._parse_results((FIXTURES / "torrentgalaxy_search.html").read_bytes())
+        assert len(tgx) == 30
+        assert tgx[0].title == "The Witcher 3 Wild Hunt TENOKE (30.4 GB) & more"
+        assert tgx[0].size_gb == 60.36
+
+def test_lxml_extraction_handles_empty_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {"search": {"cache_dir": tmp}}
+        assert LeetxProvider(config)._parse_rows(b"") == []
+        assert LeetxProvider(config)._parse_magnet(b"<html></html>") == ""
+        assert NyaaProvider(config)._parse_results(b"<html><body>No results</body></html>") == []
+        assert TorrentGalaxyProvider(config)._parse_results(b"") == []
+
+JACKETT_INDEXERS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<indexers>
+  <indexer id="fast" configured="true"><title>Fast</title><caps><categories><category id="4000" name="PC"/></categories></caps></indexer>
+  <indexer id="slow" configured="true"><title>Slow</title><caps><categories><category id="4050" name="PC/Games"/></categories></caps></indexer>
+  <indexer id="anime" configured="true"><title>Anime</title><caps><categories><category id="5070" name="TV/Anime"/></categories></caps></indexer>
+</indexers>"""
+
+class FakeJsonResponse(FakeResponse):
+    def __init__(self, data, status_code=200):
+        super().__init__("", status_code)
+        self.data = data
+
+    def json(self):
+        return self.data
+
+def test_jackett_queries_discovered_indexers_with_deadline():
+    p = JackettProvider({"search": {"timeout_per_source": 0.5}, "jackett": {"min_seeders": 1}})
+    calls = []
+    def fake_get(url, health_key=None, **kwargs):
+        calls.append(url)
+        if "torznab" in url:
+            return FakeResponse(JACKETT_INDEXERS.decode())
+        if "/slow/" in url:
+            time.sleep(1.0)
+        assert kwargs["params"]["Category[]"] == [4000, 4050]
+        return FakeJsonResponse({"Results": [
+            {"Title": "Elden Ring-RUNE", "Seeders": 50, "Peers": 60, "Size": 50 * 1024**3,
+             "MagnetUri": "magnet:?xt=urn:btih:" + "b" * 40},
+            {"Title": "Elden Ring Dead", "Seeders": 0, "Peers": 0, "Size": 1, "Link": "http://x"},
+        ]})
+    p._get = fake_get
+    start = time.monotonic()
+    results = p.search("elden ring")
+    assert time.monotonic() - start < 0.9
+    assert [r.title for r in results] == ["Elden Ring-RUNE"]
+    assert results[0].info_hash == "b" * 40
+    assert p.indexers == ["fast", "slow"]
+    p.search("elden ring")
+    assert sum(1 for url in calls if "torznab" in url) == 1
+    assert not any("/anime/" in url for url in calls)
+
+def test_jackett_outage_reaches_the_provider_breaker():
+    SearchProvider.health.reset()
+    p = JackettProvider({"search": {"timeout_per_source": 2}})
+    calls = []
+    def fake_get(url, health_key=None, **kwargs):
+        calls.append(url)
+        if "torznab" in url:
+            return FakeResponse(JACKETT_INDEXERS.decode())
+        raise requests.exceptions.ConnectionError("connection refused")
+    p._get = fake_get
+    assert p.is_available() and calls == ["http://127.0.0.1:9117/api/v2.0/indexers/all/results/torznab/api"]
+    cache = ResultCache(":memory:")
+    engine = SearchEngine([p], {}, cache)
+    assert engine.search(["elden ring"], log=lambda *_: None) == []
+    assert SearchProvider.health.failure_count("jackett") == 1
+    assert cache.get("jackett", "elden ring") is None
+    engine.close()
+
+class MirrorTransport:
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+
+    def get(self, url, limited=False, **kwargs):
+        self.calls.append(url)
+        time.sleep(self.delays[url])
+        return FakeJsonResponse([{"name": f"Elden Ring {url}", "info_hash": "c" * 40,
+                                  "seeders": "10", "leechers": "1", "size": "1024"}])
+
+def test_tpb_hedges_to_second_mirror_and_prefers_fastest():
+    SearchProvider.health.reset()
+    slow, fast = ThePirateBayProvider.API_URLS
+    p = ThePirateBayProvider({"search": {"timeout_per_source": 3, "hedge": {"delay": 0.1, "min_delay": 0.3}}})
+    p.transport = MirrorTransport({slow: 1.0, fast: 0.05})
+    start = time.monotonic()
+    results = p.search("elden ring")
+    assert time.monotonic() - start < 0.8
+    assert [r.title for r in results] == [f"Elden Ring {fast}"]
+    assert p.transport.calls == [slow, fast]
+    p.transport.calls.clear()
+    p.search("elden ring")
+    assert p.transport.calls == [fast]
+
+class DeadMirrorTransport:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, limited=False, **kwargs):
+        self.calls.append(url)
+        raise requests.exceptions.ConnectionError("connection refused")
+
+def test_tpb_outage_of_every_mirror_reaches_the_provider_breaker():
+    SearchProvider.health.reset()
+    p = ThePirateBayProvider({"search": {"timeout_per_source": 2, "hedge": {"delay": 0.01, "min_delay": 0.01}}})
+    p.transport = DeadMirrorTransport()
+    for n in range(1, 4):
+        assert p.search("elden ring") == []
+        assert SearchProvider.health.failure_count("thepiratebay") == n
+    assert SearchProvider.health.state("thepiratebay") == OPEN
+    p.transport.calls.clear()
+    assert p.search("elden ring") == []
+    assert p.transport.calls == []
+
+def test_pagination_stops_at_first_irrelevant_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        p = NyaaProvider({"search": {"cache_dir": tmp, "max_results_per_source": 100,
+                                     "pagination": {"max_pages": 6, "page_concurrency": 2}}})
+        p.scorer = ConfidenceScorer(QueryNormalizer({}))
+        titles = {1: "Elden Ring v1.0", 2: "Elden Ring v1.1", 3: "Dark Souls", 4: "Elden Ring v1.2"}
+        requested = []
+        def page(query, n, deadline):
+            requested.append(n)
+            return [SearchResult(f"{titles.get(n, 'x')} #{i}", f"magnet:?xt=urn:btih:{n}{i}", 1, 0, 1.0, "nyaa", "")
+                    for i in range(30)]
+        p._search_page = page
+        results = p.search("(elden ring)|(elden ring shadow of the erdtree)")
+        assert sorted(requested) == [1, 2, 3]
+        assert len(results) == 90
+        requested.clear()
+        p.max_results = 40
+        assert len(p.search("elden ring")) == 40
+        assert sorted(requested) == [1, 2, 3]
+        requested.clear()
+        p.scorer = None
+        p.search("elden ring")
+        assert requested == [1]
+
+class ResetTransport:
+    def get(self, url, limited=False, **kwargs):
+        raise requests.exceptions.ConnectionError("connection reset by peer")
+
+def test_connection_reset_counts_toward_threshold():
+    SearchProvider.health.reset()
+    p = NyaaProvider({})
+    p.transport = ResetTransport()
+    states = []
+    for _ in range(3):
+        try:
+            p._get("https://nyaa.si/view/1")
+        except requests.exceptions.ConnectionError:
+            states.append(SearchProvider.health.state("nyaa"))
+    assert OPEN not in states[:2] and states[2] == OPEN
+
+class ThrottledTransport:
+    def __init__(self, refuse):
+        self.refuse = refuse
+
+    def get(self, url, limited=False, **kwargs):
+        if self.refuse:
+            raise RateLimited("1337x.to: no request slot before deadline")
+        return FakeResponse("", status_code=429)
+
+def test_throttled_search_is_not_cached_as_negative():
+    with tempfile.TemporaryDirectory() as tmp:
+        for refuse in (True, False):
+            SearchProvider.health.reset()
+            p = make_leetx(tmp)
+            p.transport = ThrottledTransport(refuse)
+            p.health.record_success(p.name)
+            cache = ResultCache(":memory:")
+            engine = SearchEngine([p], {}, cache)
+            assert engine.search(["elden ring"], log=lambda *_: None) == []
+            assert cache.get("1337x", "elden ring") is None
+            assert SearchProvider.health.throttled_count("1337x") == 1
+            engine.close()
+
 if __name__ == "__main__":
     test_search_result_creation()
     test_search_result_is_magnet()
+    test_transport_reuses_connections()
+    test_transport_retries_throttled_request_and_backs_off()
+    test_host_limiter_aimd_and_deadline()
+    test_leetx_resolves_detail_pages_concurrently_and_caches()
+    test_leetx_returns_partial_results_at_deadline()
+    test_leetx_lazy_magnets_resolve_only_the_winner()
+    test_ranker_skips_unresolvable_candidates()
+    test_shared_result_resolves_once()
+    test_lxml_extraction_on_saved_pages()
+    test_lxml_extraction_handles_empty_pages()
+    test_jackett_queries_discovered_indexers_with_deadline()
+    test_jackett_outage_reaches_the_provider_breaker()
+    test_tpb_hedges_to_second_mirror_and_prefers_fastest()
+    test_tpb_outage_of_every_mirror_reaches_the_provider_breaker()
+    test_pagination_stops_at_first_irrelevant_page()
+    test_connection_reset_counts_toward_threshold()
+    test_throttled_search_is_not_cached_as_negative()
     print("All provider base tests passed!")
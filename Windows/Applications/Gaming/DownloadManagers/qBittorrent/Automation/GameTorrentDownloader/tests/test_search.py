@@ -0,0 +1,498 @@
+import sys
+import os
+import time
+import asyncio
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from providers.base import SearchProvider, SearchResult, HealthRegistry, CLOSED, OPEN, HALF_OPEN
+from search.engine import SearchEngine
+from search.cache import ResultCache
+from search.planner import QueryPlanner
+from matching.normalizer import QueryNormalizer
+from matching.scorer import ConfidenceScorer
+from ranking.ranker import Ranker
+from ranking.streaming import StreamingRanker
+from ranking.parallel import ParallelScorer
+from cli_downloader import search_and_rank, run_batch
+
+class FakeProvider(SearchProvider):
+    def __init__(self, name, delay=0.0, online=True, fail=False):
+        super().__init__({})
+        self.name = name
+        self.delay = delay
+        self.online = online
+        self.fail = fail
+        self.queries = []
+
+    def is_available(self) -> bool:
+        return self.online
+
+    def search(self, query: str):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("boom")
+        return [SearchResult(f"{query} {self.name}", f"magnet:?xt=urn:btih:{self.name}{query}", 10, 1, 5.0, self.name, "")]
+
+def test_engine_runs_expansions_concurrently():
+    SearchProvider.health.reset()
+    providers = [FakeProvider(f"p{i}", delay=0.2) for i in range(3)]
+    engine = SearchEngine(providers, {"search": {"max_concurrency": 16}})
+    start = time.monotonic()
+    results = engine.search(["a", "b", "c"], log=lambda *_: None)
+    elapsed = time.monotonic() - start
+    assert len(results) == 9
+    assert elapsed < 0.5
+
+def test_engine_skips_offline_and_failing_providers():
+    SearchProvider.health.reset()
+    providers = [FakeProvider("up"), FakeProvider("down", online=False), FakeProvider("broken", fail=True)]
+    engine = SearchEngine(providers, {})
+    results = engine.search(["a"], log=lambda *_: None)
+    assert [r.source for r in results] == ["up"]
+    assert providers[1].queries == []
+
+def test_engine_respects_concurrency_cap():
+    providers = [FakeProvider(f"p{i}", delay=0.1) for i in range(4)]
+    engine = SearchEngine(providers, {"search": {"max_concurrency": 2}})
+    start = time.monotonic()
+    engine.search(["a"], log=lambda *_: None)
+    assert time.monotonic() - start >= 0.2
+
+def test_engine_probes_only_unknown_providers():
+    SearchProvider.health.reset()
+    provider = FakeProvider("probed")
+    probes = []
+    provider.is_available = lambda: probes.append(1) or True
+    engine = SearchEngine([provider], {})
+    engine.search(["a"], log=lambda *_: None)
+    engine.search(["b"], log=lambda *_: None)
+    assert len(probes) == 1
+    assert provider.queries == ["a", "b"]
+
+def test_circuit_breaker_opens_and_half_opens():
+    registry = HealthRegistry(failure_threshold=2, reset_timeout=0.05)
+    registry.record_success("x", 0.1)
+    assert registry.state("x") == CLOSED
+    registry.record_failure("x")
+    assert registry.allow("x")
+    registry.record_failure("x")
+    assert registry.state("x") == OPEN
+    assert not registry.allow("x")
+    time.sleep(0.06)
+    assert registry.state("x") == HALF_OPEN
+    assert registry.allow("x")
+    assert not registry.allow("x")
+    registry.record_failure("x")
+    assert registry.state("x") == OPEN
+
+def test_dead_provider_is_skipped_after_first_failure():
+    SearchProvider.health.reset()
+    provider = FakeProvider("dead", online=False)
+    engine = SearchEngine([provider], {})
+    engine.search(["a"], log=lambda *_: None)
+    calls = []
+    provider.is_available = lambda: calls.append(1) or False
+    engine.search(["b"], log=lambda *_: None)
+    assert calls == []
+    assert provider.queries == []
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_result_cache_ttl_and_negative_entries():
+    clock = Clock()
+    cache = ResultCache(":memory:", ttl=100, negative_ttl=10, max_stale=1000, clock=clock)
+    result = SearchResult("Elden Ring-RUNE", "magnet:?xt=urn:btih:abc", 5, 1, 50.0, "p", "abc")
+    assert cache.get("p", "elden ring") is None
+    cache.put("p", "Elden  Ring", [result])
+    assert cache.get("p", "elden ring") == ([result], True)
+    clock.now += 150
+    assert cache.get("p", "elden ring") == ([result], False)
+    clock.now += 2000
+    assert cache.get("p", "elden ring") is None
+    cache.put("p", "nothing", [])
+    assert cache.get("p", "nothing") == ([], True)
+    clock.now += 20
+    assert cache.get("p", "nothing") is None
+    assert (cache.hits, cache.stale_hits, cache.negative_hits, cache.misses) == (1, 1, 1, 3)
+
+def test_engine_serves_stale_results_and_refreshes_in_background():
+    SearchProvider.health.reset()
+    clock = Clock()
+    cache = ResultCache(":memory:", ttl=100, clock=clock)
+    provider = FakeProvider("cached")
+    engine = SearchEngine([provider], {}, cache)
+    first = engine.search(["a"], log=lambda *_: None)
+    assert engine.search(["a"], log=lambda *_: None) == first
+    assert provider.queries == ["a"]
+    clock.now += 150
+    provider.delay = 0.2
+    start = time.monotonic()
+    assert engine.search(["a"], log=lambda *_: None) == first
+    assert time.monotonic() - start < 0.2
+    engine.close()
+    assert provider.queries == ["a", "a"]
+    assert cache.get("p", "a") is None
+    assert cache.get("cached", "a")[1] is True
+
+def test_engine_does_not_cache_failed_searches_as_negative():
+    SearchProvider.health.reset()
+    cache = ResultCache(":memory:")
+    provider = FakeProvider("flaky")
+    def failing_search(query):
+        provider.health.record_failure(provider.name)
+        return []
+    provider.search = failing_search
+    engine = SearchEngine([provider], {}, cache)
+    engine.search(["a"], log=lambda *_: None)
+    assert cache.get("flaky", "a") is None
+
+def test_engine_does_not_cache_partial_results():
+    SearchProvider.health.reset()
+    cache = ResultCache(":memory:")
+    provider = FakeProvider("slow")
+    search = provider.search
+    def truncated_search(query):
+        provider.health.record_partial(provider.name)
+        return search(query)
+    provider.search = truncated_search
+    engine = SearchEngine([provider], {}, cache)
+    assert len(engine.search(["a"], log=lambda *_: None)) == 1
+    assert cache.get("slow", "a") is None
+
+def test_cached_answer_does_not_hold_the_half_open_trial():
+    SearchProvider.health.reset()
+    provider = FakeProvider("recovering")
+    engine = SearchEngine([provider], {}, ResultCache(":memory:"))
+    engine.search(["elden ring"], log=lambda *_: None)
+    provider.health.record_failure(provider.name, fatal=True)
+    provider.health.summary()[provider.name].opened_at -= provider.health.reset_timeout
+    assert provider.health.state(provider.name) == HALF_OPEN
+    assert len(engine.search(["elden ring"], log=lambda *_: None)) == 1
+    assert len(engine.search(["dark souls"], log=lambda *_: None)) == 1
+    assert len(engine.search(["hades"], log=lambda *_: None)) == 1
+    assert provider.queries == ["elden ring", "dark souls", "hades"]
+
+def test_stale_refresh_shares_the_concurrency_limit():
+    SearchProvider.health.reset()
+    clock = Clock()
+    cache = ResultCache(":memory:", ttl=100, clock=clock)
+    active = []
+    peak = []
+    class CountingProvider(FakeProvider):
+        def search(self, query):
+            active.append(1)
+            peak.append(len(active))
+            try:
+                return super().search(query)
+            finally:
+                active.pop()
+    stale, busy = CountingProvider("stale", delay=0.2), CountingProvider("busy", delay=0.2)
+    engine = SearchEngine([stale], {"search": {"max_concurrency": 1}}, cache)
+    engine.search(["a"], log=lambda *_: None)
+    clock.now += 150
+    engine.providers = [stale, busy]
+    engine.search(["a"], log=lambda *_: None)
+    engine.close()
+    assert stale.queries == ["a", "a"] and busy.queries == ["a"]
+    assert max(peak) == 1
+
+class ListProvider(FakeProvider):
+    def __init__(self, name, results, delay=0.0):
+        super().__init__(name, delay=delay)
+        self.results = results
+
+    def search(self, query: str):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        return list(self.results)
+
+def make_ranker():
+    n = QueryNormalizer({})
+    return Ranker(n, ConfidenceScorer(n))
+
+def test_streaming_ranker_matches_batch_ranking():
+    results = [
+        SearchResult("Elden Ring-RUNE", "magnet:?xt=urn:btih:a", 10, 1, 50.0, "p1", "a"),
+        SearchResult("Elden Ring [FitGirl Repack]", "magnet:?xt=urn:btih:b", 300, 1, 40.0, "p1", "b"),
+        SearchResult("Elden Ring-RUNE", "magnet:?xt=urn:btih:a", 90, 1, 50.0, "p2", "a"),
+        SearchResult("Elden.Ring.2022.1080p.WEB-DL.x264", "magnet:?xt=urn:btih:c", 900, 1, 2.0, "p2", "c"),
+        SearchResult("Elden Ring Deluxe Edition-FLT", "magnet:?xt=urn:btih:d", 90, 1, 60.0, "p3", "d"),
+    ]
+    ranker = make_ranker()
+    streaming = StreamingRanker(ranker, "elden ring", 50, top_k=2)
+    streaming.add("p1", results[:2])
+    streaming.add("p2", results[2:4])
+    streaming.add("p3", results[4:])
+    assert streaming.ranked() == ranker.rank("elden ring", results, 50)
+    assert len(streaming.top) == 2
+    assert streaming.total == 5
+
+def test_parallel_ranking_matches_serial():
+    aliases = {"elden ring": ["er"], "dark souls 3": ["ds3"]}
+    n = QueryNormalizer(aliases)
+    words = ["Elden", "Ring", "ER", "DS3", "Dark", "Souls", "III", "FitGirl", "RUNE", "1080p", "GOTY", "12 GB", "2022"]
+    rnd = random.Random(7)
+    results = [
+        SearchResult(" ".join(rnd.sample(words, rnd.randint(1, 6))), f"magnet:?xt=urn:btih:{i}", rnd.randint(0, 50),
+                     0, 10.0, "p1", f"{i}")
+        for i in range(300)
+    ]
+    parallel = ParallelScorer(aliases, workers=2, min_results=100, batch_size=37)
+    try:
+        serial = Ranker(n, ConfidenceScorer(n))
+        pooled = Ranker(n, ConfidenceScorer(n), parallel)
+        for query in ["elden ring", "ds3"]:
+            assert pooled.rank(query, results, 50) == serial.rank(query, results, 50)
+        assert parallel._pool is not None
+    finally:
+        parallel.close()
+
+def test_streaming_ranker_awaits_the_pool_without_blocking_the_loop():
+    n = QueryNormalizer({})
+    results = [SearchResult(f"Elden Ring build {i} [FitGirl Repack]", f"magnet:?xt=urn:btih:{i}", i % 40, 0, 10.0,
+                            "p1", f"{i}") for i in range(2000)]
+    parallel = ParallelScorer({}, workers=2, min_results=100, batch_size=250)
+    ticks = []
+
+    async def run():
+        async def tick():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.001)
+        ticker = asyncio.ensure_future(tick())
+        await asyncio.sleep(0)
+        streaming = StreamingRanker(Ranker(n, ConfidenceScorer(n), parallel), "elden ring", 50)
+        await streaming.add_async("p1", results)
+        ticker.cancel()
+        return streaming.ranked()
+
+    try:
+        ranked = asyncio.run(run())
+        assert len(ticks) > 1
+        assert ranked == Ranker(n, ConfidenceScorer(n)).rank("elden ring", results, 50)
+    finally:
+        parallel.close()
+
+def test_search_and_rank_sends_the_combined_backlog_to_the_pool():
+    SearchProvider.health.reset()
+    providers = [ListProvider(f"p{k}", [SearchResult(f"Elden Ring build {k}{i} [FitGirl Repack]",
+                                                     f"magnet:?xt=urn:btih:{k}{i}", 100 * k + i, 0, 10.0, f"p{k}", f"{k}{i}")
+                                        for i in range(60)], delay=0.1) for k in range(3)]
+    config = {"search": {"early_commit": {"enabled": False}}}
+    engine = SearchEngine(providers, config)
+    parallel = ParallelScorer({}, workers=2, min_results=100, batch_size=50)
+    sizes = []
+    score_many_async = parallel.score_many_async
+    async def recording(query, titles):
+        sizes.append(len(titles))
+        return await score_many_async(query, titles)
+    parallel.score_many_async = recording
+    n = QueryNormalizer({})
+
+    async def run():
+        async def hog():
+            # Holds the loop while every provider answers, so their batches
+            # are all waiting when the stream next reads.
+            await asyncio.sleep(0.05)
+            time.sleep(0.3)
+        hogger = asyncio.ensure_future(hog())
+        found = await search_and_rank(engine, Ranker(n, ConfidenceScorer(n), parallel), "elden ring",
+                                      ["elden ring"], config, log=lambda *_: None)
+        await hogger
+        return found
+
+    try:
+        streaming, ranked = engine.run(run())
+        assert sizes and max(sizes) >= 100
+        every = [r for p in providers for r in p.results]
+        assert ranked == Ranker(n, ConfidenceScorer(n)).rank("elden ring", every, 50)
+        assert streaming.total == 180
+    finally:
+        parallel.close()
+
+def test_early_commit_cancels_slow_sources():
+    SearchProvider.health.reset()
+    winner = SearchResult("Elden Ring [FitGirl Repack]", "magnet:?xt=urn:btih:" + "f" * 40, 500, 3, 40.0, "fast", "f" * 40)
+    fast = ListProvider("fast", [winner])
+    slow = ListProvider("slow", [], delay=1.5)
+    config = {"search": {"early_commit": {"min_confidence": 90, "min_seeders": 100, "min_sources": 1}}}
+    engine = SearchEngine([fast, slow], config)
+    start = time.monotonic()
+    streaming, ranked = engine.run(search_and_rank(engine, make_ranker(), "elden ring", ["elden ring"], config,
+                                                   log=lambda *_: None))
+    assert time.monotonic() - start < 1.0
+    assert streaming.committed
+    assert ranked[0] is winner
+
+def test_no_early_commit_below_rule_waits_for_all_sources():
+    SearchProvider.health.reset()
+    weak = SearchResult("Elden Ring [FitGirl Repack]", "magnet:?xt=urn:btih:" + "e" * 40, 5, 3, 40.0, "fast", "e" * 40)
+    fast = ListProvider("fast", [weak])
+    slow = ListProvider("slow", [], delay=0.3)
+    config = {"search": {"early_commit": {"min_confidence": 90, "min_seeders": 100}}}
+    engine = SearchEngine([fast, slow], config)
+    streaming, ranked = engine.run(search_and_rank(engine, make_ranker(), "elden ring", ["elden ring"], config,
+                                                   log=lambda *_: None))
+    assert not streaming.committed
+    assert streaming.sources == {"fast", "slow"}
+    assert ranked == [weak]
+
+class TitleProvider(FakeProvider):
+    def search(self, query: str):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        return [SearchResult(f"{query} [FitGirl Repack]", f"magnet:?xt=urn:btih:{query}", 500, 1, 30.0, self.name, query)]
+
+class FakeQb:
+    def __init__(self):
+        self.added = []
+
+    def add_torrent(self, magnet, name=""):
+        time.sleep(0.1)
+        self.added.append(name)
+        return "missing" not in name
+
+def test_batch_overlaps_terms_and_keeps_output_ordered(capsys):
+    SearchProvider.health.reset()
+    provider = TitleProvider("p", delay=0.3)
+    config = {"search": {"max_terms_in_flight": 3, "early_commit": {"enabled": False}}}
+    engine = SearchEngine([provider], config)
+    ranker = make_ranker()
+    qb = FakeQb()
+    terms = ["hades", "elden ring", "missing game"]
+    start = time.monotonic()
+    success = engine.run(run_batch(engine, ranker.normalizer, ranker, qb, terms, config))
+    assert time.monotonic() - start < 0.9
+    assert success == 2
+    out = capsys.readouterr().out
+    positions = [out.index(f"Searching for: {t}") for t in terms]
+    assert positions == sorted(positions)
+    assert out.count("ADDED TO QBITTORRENT") == 2
+
+def test_batch_isolates_a_failing_term(capsys):
+    SearchProvider.health.reset()
+    provider = TitleProvider("p")
+    config = {"search": {"early_commit": {"enabled": False}}}
+    engine = SearchEngine([provider], config)
+    ranker = make_ranker()
+    qb = FakeQb()
+    add = qb.add_torrent
+    def add_torrent(magnet, name=""):
+        if "hades" in name:
+            raise RuntimeError("WebUI went away")
+        return add(magnet, name)
+    qb.add_torrent = add_torrent
+    success = engine.run(run_batch(engine, ranker.normalizer, ranker, qb, ["hades", "elden ring"], config))
+    assert success == 1
+    out = capsys.readouterr().out
+    assert "Error processing 'hades': WebUI went away" in out
+    assert out.count("ADDED TO QBITTORRENT") == 1
+
+class OrProvider(FakeProvider):
+    def merge_queries(self, queries):
+        return "|".join(f"({q})" for q in queries)
+
+def test_planner_collapses_equivalent_and_narrower_variants():
+    planner = QueryPlanner(QueryNormalizer({}))
+    assert planner.collapse(["gta v", "gta 5", "grand theft auto v", "grand theft auto 5"]) == ["gta v", "grand theft auto v"]
+    assert planner.collapse(["elden ring", "elden ring shadow of the erdtree"]) == ["elden ring"]
+    assert planner.collapse(["ac", "ac valhalla"]) == ["ac", "ac valhalla"]
+    assert planner.collapse(["silent hill 2", "silent hill"]) == ["silent hill 2", "silent hill"]
+
+def test_planner_keeps_the_term_when_broad_results_are_capped():
+    SearchProvider.health.reset()
+    class CappedProvider(FakeProvider):
+        def search(self, query):
+            self.queries.append(query)
+            titles = [f"Elden Ring Build {i}" for i in range(50)] + ["Elden Ring Shadow of the Erdtree-RUNE"]
+            tokens = set(query.split())
+            return [SearchResult(t, f"magnet:?xt=urn:btih:{i}", 5, 1, 10.0, self.name, "")
+                    for i, t in enumerate(titles) if tokens <= set(t.lower().replace("-", " ").split())][:10]
+    provider = CappedProvider("capped")
+    engine = SearchEngine([provider], {}, planner=QueryPlanner(QueryNormalizer({})))
+    results = engine.search(["elden ring shadow of the erdtree", "elden ring"], log=lambda *_: None)
+    assert provider.queries == ["elden ring shadow of the erdtree", "elden ring"]
+    assert "Elden Ring Shadow of the Erdtree-RUNE" in [r.title for r in results]
+
+def test_planner_merges_variants_for_or_capable_providers():
+    planner = QueryPlanner(QueryNormalizer({}))
+    plain, orable = FakeProvider("plain"), OrProvider("orable")
+    pairs = planner.plan([plain, orable], ["gta v", "gta 5", "grand theft auto v"])
+    assert [(p.name, q) for p, q in pairs] == [
+        ("plain", "gta v"), ("plain", "grand theft auto v"), ("orable", "(gta v)|(grand theft auto v)"),
+    ]
+
+def test_engine_uses_planner():
+    SearchProvider.health.reset()
+    provider = FakeProvider("planned")
+    engine = SearchEngine([provider], {}, planner=QueryPlanner(QueryNormalizer({})))
+    engine.search(["gta v", "gta 5"], log=lambda *_: None)
+    assert provider.queries == ["gta v"]
+
+def test_identical_in_flight_searches_share_one_call():
+    SearchProvider.health.reset()
+    provider = FakeProvider("shared", delay=0.2)
+    engine = SearchEngine([provider], {})
+    quiet = lambda *_: None
+
+    async def both():
+        return await asyncio.gather(engine.search_async(["Dark Souls"], quiet),
+                                    engine.search_async(["dark  souls"], quiet))
+
+    first, second = engine.run(both())
+    assert provider.queries == ["Dark Souls"]
+    assert [r.title for r in first] == [r.title for r in second] == ["Dark Souls shared"]
+    assert engine.flights.calls == 1 and engine.flights.coalesced == 1
+
+def test_cancelled_subscriber_does_not_cancel_shared_search():
+    SearchProvider.health.reset()
+    provider = FakeProvider("shared", delay=0.2)
+    engine = SearchEngine([provider], {})
+    quiet = lambda *_: None
+
+    async def impatient():
+        try:
+            await asyncio.wait_for(engine.search_async(["a"], quiet), timeout=0.05)
+        except asyncio.TimeoutError:
+            return None
+
+    async def both():
+        return await asyncio.gather(impatient(), engine.search_async(["a"], quiet))
+
+    gave_up, patient = engine.run(both())
+    assert gave_up is None
+    assert [r.source for r in patient] == ["shared"]
+    assert provider.queries == ["a"]
+
+if __name__ == "__main__":
+    test_engine_runs_expansions_concurrently()
+    test_engine_skips_offline_and_failing_providers()
+    test_engine_respects_concurrency_cap()
+    test_engine_probes_only_unknown_providers()
+    test_circuit_breaker_opens_and_half_opens()
+    test_dead_provider_is_skipped_after_first_failure()
+    test_result_cache_ttl_and_negative_entries()
+    test_engine_serves_stale_results_and_refreshes_in_background()
+    test_engine_does_not_cache_failed_searches_as_negative()
+    test_engine_does_not_cache_partial_results()
+    test_cached_answer_does_not_hold_the_half_open_trial()
+    test_stale_refresh_shares_the_concurrency_limit()
+    test_streaming_ranker_matches_batch_ranking()
+    test_parallel_ranking_matches_serial()
+    test_streaming_ranker_awaits_the_pool_without_blocking_the_loop()
+    test_search_and_rank_sends_the_combined_backlog_to_the_pool()
+    test_early_commit_cancels_slow_sources()
+    test_no_early_commit_below_rule_waits_for_all_sources()
+    test_planner_collapses_equivalent_and_narrower_variants()
+    test_planner_keeps_the_term_when_broad_results_are_capped()
+    test_planner_merges_variants_for_or_capable_providers()
+    test_engine_uses_planner()
+    test_identical_in_flight_searches_share_one_call()
+    test_cancelled_subscriber_does_not_cancel_shared_search()
+    print("All search engine tests passed!")